@@ -1,5 +1,6 @@
 from dash import Dash, _dash_renderer
 import dash_mantine_components as dmc
+from flask import Response, abort
 
 import warnings
 warnings.filterwarnings("ignore")
@@ -7,6 +8,12 @@ warnings.filterwarnings("ignore")
 _dash_renderer._set_react_version("18.2.0")
 
 from components.app_shell import create_app_shell
+from data.geometry import ZONE_FILES, get_zones_geojson_bytes
+from server.compression import init_compression
+from server.coordination import init_coordination
+from server.metrics import init_metrics
+from server.profiler import init_profiler
+from view.images import get_image, init_images, render_image
 
 app = Dash(
     __name__,
@@ -26,6 +33,49 @@ app.layout = dmc.MantineProvider(
 )
 
 server = app.server
+init_compression(
+    server,
+    app.config.assets_folder,
+    app.config.routes_pathname_prefix + app.config.assets_url_path.lstrip("/") + "/",
+)
+init_metrics(server)
+init_profiler(server)
+init_coordination(server)
+init_images(server)
+
+
+@server.route("/geojson/<level>.json")
+def zones_geojson(level: str) -> Response:
+    """
+    District and barri polygons, referenced by URL from the choropleths so
+    each client downloads them once and keeps them in its HTTP cache.
+    """
+    if level not in ZONE_FILES:
+        abort(404)
+    return Response(
+        get_zones_geojson_bytes(level),
+        mimetype="application/geo+json",
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
+
+
+@server.route("/images/<key>.png")
+def rendered_image(key: str) -> Response:
+    """
+    Server side rendered plots, keyed by the hash of their content. A plot
+    still rendering answers 202, so no request thread waits on it.
+    """
+    png = get_image(key)
+    if png is None:
+        if not render_image(key):
+            abort(404)
+        return Response(status=202, headers={"Retry-After": "1", "Cache-Control": "no-store"})
+    return Response(
+        png,
+        mimetype="image/png",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
 
 if __name__ == "__main__":
     app.run(debug=True)
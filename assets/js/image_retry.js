@@ -0,0 +1,30 @@
+// Server side rendered plots answer 202 without a body while they render,
+// which the browser shows as a broken image: their src is loaded again
+// until the image is ready.
+(function () {
+    const RETRY_DELAY = 1000;
+    const MAX_RETRIES = 60;
+    const IMAGE_URL = /\/images\/[0-9a-f]{64}\.png/;
+
+    document.addEventListener(
+        "error",
+        (event) => {
+            const img = event.target;
+            if (!(img instanceof HTMLImageElement) || !IMAGE_URL.test(img.src)) {
+                return;
+            }
+            const retries = Number(img.dataset.retries || 0);
+            if (retries >= MAX_RETRIES) {
+                return;
+            }
+            img.dataset.retries = retries + 1;
+            setTimeout(() => {
+                const url = new URL(img.src);
+                url.searchParams.set("retry", retries + 1);
+                img.src = url.toString();
+            }, RETRY_DELAY);
+        },
+        // Image errors do not bubble, they are caught on their way down
+        true
+    );
+})();
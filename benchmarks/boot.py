@@ -0,0 +1,127 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_FILE = os.path.join(ROOT_PATH, "benchmarks", "importtime.txt")
+
+# Cold start budget of a worker importing the app, in seconds
+BOOT_BUDGET = 4.0
+
+# Libraries only needed when a figure or an analysis is first computed
+DEFERRED_MODULES = [
+    "matplotlib",
+    "seaborn",
+    "scipy",
+    "sklearn",
+    "folium",
+    "plotly.express",
+]
+
+PROJECT_PACKAGES = ("app", "components", "data", "pages", "server", "view")
+
+_LINE_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# --- IMPORT TIMES ---
+
+
+def import_times() -> list[tuple[str, int, int, int]]:
+    """
+    Import the app in a fresh interpreter with -X importtime.
+
+    Returns
+    -------
+    list[tuple[str, int, int, int]]
+        One (module, self µs, cumulative µs, depth) tuple per imported module,
+        in the order printed by the interpreter.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", "import app"],
+        cwd=ROOT_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [
+        (name, int(own), int(cumulative), len(indent) // 2)
+        for own, cumulative, indent, name in _LINE_PATTERN.findall(process.stderr)
+    ]
+
+
+def boot_time(times: list[tuple[str, int, int, int]]) -> float:
+    """Cumulative import time of the app in seconds."""
+    return next(cumulative for name, _, cumulative, _ in times if name == "app") / 1e6
+
+
+def report(times: list[tuple[str, int, int, int]], top: int = 30) -> str:
+    """Import time breakdown: the slowest modules and every project module."""
+    lines = [
+        f"Boot time (import app): {boot_time(times):.2f} s, budget {BOOT_BUDGET:.2f} s",
+        f"Modules imported: {len(times)}",
+        "",
+        f"{'cumulative [ms]':>16}{'self [ms]':>12}  module",
+    ]
+
+    def row(name, own, cumulative, depth):
+        return f"{cumulative / 1000:>16.1f}{own / 1000:>12.1f}  {'  ' * depth}{name}"
+
+    lines.append(f"\nSlowest {top} imports")
+    for item in sorted(times, key=lambda item: item[2], reverse=True)[:top]:
+        lines.append(row(*item))
+
+    lines.append("\nProject modules")
+    for item in times:
+        if item[0].split(".")[0] in PROJECT_PACKAGES:
+            lines.append(row(*item))
+
+    return "\n".join(lines) + "\n"
+
+
+def check(times: list[tuple[str, int, int, int]], budget: float) -> list[str]:
+    """Reasons why the boot is over budget, empty when it is within."""
+    errors = []
+    if boot_time(times) > budget:
+        errors.append(f"boot time {boot_time(times):.2f} s over the {budget:.2f} s budget.")
+
+    imported = {name for name, *_ in times}
+    for module in DEFERRED_MODULES:
+        if module in imported:
+            errors.append(f"{module} imported at boot, it should be imported lazily.")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import time breakdown of the app and cold start budget check."
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="cold imports, the fastest one is kept"
+    )
+    parser.add_argument(
+        "--write", action="store_true", help="update the report benchmarks/importtime.txt"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="exit with an error when over budget"
+    )
+    parser.add_argument("--budget", type=float, default=BOOT_BUDGET, help="seconds")
+    args = parser.parse_args()
+
+    times = min((import_times() for _ in range(args.runs)), key=boot_time)
+
+    text = report(times)
+    print(text)
+    if args.write:
+        with open(REPORT_FILE, "w") as file:
+            file.write(text)
+
+    if args.check:
+        errors = check(times, args.budget)
+        for error in errors:
+            print(error, file=sys.stderr)
+        sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
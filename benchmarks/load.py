@@ -0,0 +1,439 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CALLBACK_PATH = "/_dash-update-component"
+PAGES = ["/life_quality", "/transport", "/socio-economic"]
+THEMES = ["light", "dark"]
+
+# Inputs driven by the shell rather than by the page controls
+SHELL_INPUTS = {("_pages_location", "pathname"), ("_pages_location", "search")}
+
+PERCENTILES = [50, 95, 99]
+
+# --- DASH PROTOCOL ---
+
+
+def id_key(component_id) -> str:
+    """Component id as written in the callback keys."""
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(",", ":"))
+    return component_id
+
+
+def parse_id(key: str):
+    return json.loads(key) if key.startswith("{") else key
+
+
+def is_wildcard(key: str) -> bool:
+    return key.startswith("{") and '["ALL"]' in key
+
+
+def split_output(output: str) -> tuple[list[tuple[str, str]], bool]:
+    """(id, property) of each output of a callback key, and whether there are several."""
+    output = output.split("@")[0]
+    multi = output.startswith("..")
+    parts = output[2:-2].split("...") if multi else [output]
+    return [tuple(part.rsplit(".", 1)) for part in parts], multi
+
+
+class Session:
+    """
+    A browser tab: the component values it knows, the ids on the current page
+    and the callbacks it fires when a control changes.
+    """
+
+    def __init__(self, url: str, dependencies: list[dict], rng: random.Random):
+        self.url = url
+        self.dependencies = dependencies
+        self.rng = rng
+        self.http = requests.Session()
+        self.values: dict[tuple[str, str], object] = {}
+        self.components: dict[str, dict] = {}
+        self.page_components: set[str] = set()
+        self.timings: list[tuple[str, str, float, int, int]] = []
+
+    # Layout bookkeeping
+
+    def register(self, layout, page: bool = False) -> None:
+        stack = [layout]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, dict):
+                props = node.get("props")
+                if isinstance(props, dict) and "id" in props:
+                    key = id_key(props["id"])
+                    self.components[key] = props
+                    if page:
+                        self.page_components.add(key)
+                    for prop, value in props.items():
+                        self.values[(key, prop)] = value
+                stack.extend(node.values() if props is None else props.values())
+
+    def matching(self, key: str) -> list[str]:
+        pattern = json.loads(key)
+        return [
+            other
+            for other in self.components
+            if other.startswith("{")
+            and json.loads(other).keys() == pattern.keys()
+            and all(
+                value == ["ALL"] or json.loads(other)[name] == value
+                for name, value in pattern.items()
+            )
+        ]
+
+    @staticmethod
+    def runs_on_server(dependency: dict) -> bool:
+        # Clientside callbacks run in the browser, the server does not know them
+        return not dependency.get("clientside_function")
+
+    def is_available(self, dependency: dict) -> bool:
+        ids = [key for key, _ in split_output(dependency["output"])[0]]
+        ids += [item["id"] for item in dependency["inputs"] + dependency["state"]]
+        return all(is_wildcard(key) or key in self.components for key in ids)
+
+    # Requests
+
+    def _item(self, key: str, prop: str, with_value: bool):
+        def item(component_key):
+            entry = {"id": parse_id(component_key), "property": prop}
+            if with_value:
+                entry["value"] = (
+                    parse_id(component_key)
+                    if prop == "id"
+                    else self.values.get((component_key, prop))
+                )
+            return entry
+
+        if is_wildcard(key):
+            return [item(other) for other in self.matching(key)]
+        return item(key)
+
+    def call(self, dependency: dict, changed: list[str], label: str) -> None:
+        outputs, multi = split_output(dependency["output"])
+        outputs = [self._item(key, prop, False) for key, prop in outputs]
+        body = {
+            "output": dependency["output"],
+            "outputs": outputs if multi else outputs[0],
+            "inputs": [
+                self._item(item["id"], item["property"], True)
+                for item in dependency["inputs"]
+            ],
+            "state": [
+                self._item(item["id"], item["property"], True)
+                for item in dependency["state"]
+            ],
+            "changedPropIds": changed,
+        }
+
+        start = time.perf_counter()
+        response = self.http.post(self.url + CALLBACK_PATH, json=body)
+        elapsed = time.perf_counter() - start
+        self.timings.append(
+            (label, dependency["output"], elapsed, response.status_code, len(response.content))
+        )
+
+        if response.status_code != 200:
+            return
+        for key, props in response.json().get("response", {}).items():
+            key = id_key(parse_id(key))
+            for prop, value in props.items():
+                if prop == "children" and key == "_pages_content":
+                    for other in self.page_components:
+                        self.components.pop(other, None)
+                    self.page_components = set()
+                    self.register(value, page=True)
+                elif not (isinstance(value, dict) and "__dash_patch_update" in value):
+                    self.values[(key, prop)] = value
+
+    def fire(self, key: str, prop: str, value, label: str) -> None:
+        """Change a property and run the callbacks it triggers, as the renderer does."""
+        self.values[(key, prop)] = value
+        for dependency in self.dependencies:
+            triggers = [(item["id"], item["property"]) for item in dependency["inputs"]]
+            if (
+                (key, prop) in triggers
+                and self.runs_on_server(dependency)
+                and self.is_available(dependency)
+            ):
+                self.call(dependency, [f"{key}.{prop}"], label)
+
+    # User actions
+
+    def open(self) -> None:
+        start = time.perf_counter()
+        response = self.http.get(self.url + "/")
+        self.timings.append(
+            ("index", "/", time.perf_counter() - start, response.status_code, len(response.content))
+        )
+        self.register(self.http.get(self.url + "/_dash-layout").json())
+        # Set by the browser location rather than by the layout
+        self.values[("_pages_location", "search")] = ""
+
+    def visit(self, page: str) -> None:
+        before = set(self.page_components)
+        self.fire("_pages_location", "pathname", page, f"page {page}")
+
+        # Initial calls of the callbacks whose outputs just appeared
+        for dependency in self.dependencies:
+            outputs = [key for key, _ in split_output(dependency["output"])[0]]
+            if (
+                not dependency.get("prevent_initial_call")
+                and self.runs_on_server(dependency)
+                and any(key in self.page_components - before for key in outputs)
+                and self.is_available(dependency)
+            ):
+                self.call(dependency, [], f"initial {page}")
+
+    def controls(self) -> list[tuple[str, str]]:
+        return sorted(
+            {
+                (item["id"], item["property"])
+                for dependency in self.dependencies
+                for item in dependency["inputs"]
+                if item["id"] in self.page_components
+                and (item["id"], item["property"]) not in SHELL_INPUTS
+            }
+        )
+
+    def new_value(self, key: str, prop: str):
+        props = self.components.get(key, {})
+        current = self.values.get((key, prop))
+        if prop == "checked":
+            return not current
+
+        options = []
+        for option in props.get("data") or []:
+            if isinstance(option, dict) and "items" in option:
+                options.extend(option["items"])
+            else:
+                options.append(option)
+        options = [option["value"] if isinstance(option, dict) else option for option in options]
+        if options and isinstance(current, list):
+            return self.rng.sample(options, self.rng.randint(min(2, len(options)), len(options)))
+        if options:
+            return self.rng.choice(options)
+        if "min" in props and "max" in props:
+            return self.rng.randint(props["min"], props["max"])
+        return current
+
+    def interact(self) -> None:
+        """Change one control of the page, or flip the theme one time out of four."""
+        controls = self.controls()
+        if not controls or self.rng.random() < 0.25:
+            theme = THEMES[self.values.get(("mantine-provider", "forceColorScheme")) == "light"]
+            self.fire("mantine-provider", "forceColorScheme", theme, "theme")
+            return
+        key, prop = self.rng.choice(controls)
+        self.fire(key, prop, self.new_value(key, prop), f"{key}.{prop}")
+
+
+def run_session(url: str, dependencies: list[dict], actions: int, think: float, seed: int) -> list:
+    rng = random.Random(seed)
+    session = Session(url, dependencies, rng)
+    session.open()
+    for page in rng.sample(PAGES, len(PAGES)):
+        session.visit(page)
+        for _ in range(actions):
+            time.sleep(think)
+            session.interact()
+    return session.timings
+
+
+# --- SERVER ---
+
+
+def start_server(port: int, workers: int, threads: int, preload: bool) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "gunicorn", "app:server",
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers),
+        "--threads", str(threads),
+        "--timeout", "300",
+    ]  # fmt: skip
+    if preload:
+        command.append("--preload")
+    return subprocess.Popen(command, cwd=ROOT_PATH, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(url: str, timeout: float = 300) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url + "/_dash-layout", timeout=5).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"server {url} not ready after {timeout} s.")
+
+
+def worker_pids(master: int) -> list[int]:
+    try:
+        with open(f"/proc/{master}/task/{master}/children") as file:
+            return [int(pid) for pid in file.read().split()]
+    except OSError:
+        return []
+
+
+def rss(pid: int) -> int:
+    """Resident memory of a process in bytes, 0 if it is gone."""
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RssMonitor(threading.Thread):
+    """Peak resident memory of each worker of a gunicorn master."""
+
+    def __init__(self, master: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.master = master
+        self.interval = interval
+        self.peaks: dict[int, int] = defaultdict(int)
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            for pid in worker_pids(self.master):
+                self.peaks[pid] = max(self.peaks[pid], rss(pid))
+
+
+# --- REPORT ---
+
+
+def summarize(timings: list, elapsed: float) -> dict:
+    by_label = defaultdict(list)
+    errors = defaultdict(int)
+    for label, _, seconds, status, _ in timings:
+        by_label[label].append(seconds)
+        errors[label] += status >= 400
+
+    def stats(values):
+        values = np.asarray(values) * 1000
+        return {
+            "count": len(values),
+            **{f"p{q}": float(np.percentile(values, q)) for q in PERCENTILES},
+            "max": float(values.max()),
+        }
+
+    return {
+        "requests": len(timings),
+        "errors": sum(errors.values()),
+        "elapsed": elapsed,
+        "throughput": len(timings) / elapsed,
+        "bytes": sum(size for *_, size in timings),
+        "latency_ms": stats([seconds for _, _, seconds, _, _ in timings]),
+        "by_action": {label: stats(values) for label, values in sorted(by_label.items())},
+    }
+
+
+def print_summary(summary: dict, peaks: dict[int, int]) -> None:
+    print(
+        f"{summary['requests']} requests, {summary['errors']} errors in "
+        f"{summary['elapsed']:.1f} s: {summary['throughput']:.1f} req/s, "
+        f"{summary['bytes'] / 1e6:.1f} MB"
+    )
+    header = "".join(f"{f'p{q} [ms]':>11}" for q in PERCENTILES)
+    print(f"\n{'action':<45}{'count':>7}{header}")
+    for label, stats in [("all", summary["latency_ms"]), *summary["by_action"].items()]:
+        row = "".join(f"{stats[f'p{q}']:>11.1f}" for q in PERCENTILES)
+        print(f"{label[:44]:<45}{stats['count']:>7}{row}")
+    if peaks:
+        print("\nPeak RSS per worker: " + ", ".join(
+            f"{pid}: {peak / 2**20:.0f} MB" for pid, peak in sorted(peaks.items())
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay browsing sessions against the app served by gunicorn."
+    )
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--preload", action="store_true", help="load the app before forking")
+    parser.add_argument("--port", type=int, default=8051)
+    parser.add_argument(
+        "--url", default=None, help="target a running server instead of starting one"
+    )
+    parser.add_argument("--users", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--sessions", type=int, default=16, help="sessions to replay")
+    parser.add_argument("--actions", type=int, default=5, help="interactions per page")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds between interactions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file of the results")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    if args.url is None:
+        server = start_server(args.port, args.workers, args.threads, args.preload)
+    try:
+        start = time.perf_counter()
+        wait_ready(url)
+        print(f"server ready in {time.perf_counter() - start:.1f} s")
+        monitor = None
+        if server is not None:
+            monitor = RssMonitor(server.pid)
+            monitor.start()
+
+        requests.get(url + "/")
+        dependencies = requests.get(url + "/_dash-dependencies").json()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as executor:
+            sessions = executor.map(
+                lambda seed: run_session(url, dependencies, args.actions, args.think, seed),
+                range(args.seed, args.seed + args.sessions),
+            )
+            timings = [timing for session in sessions for timing in session]
+        elapsed = time.perf_counter() - start
+
+        peaks = {}
+        if monitor is not None:
+            monitor.stopped.set()
+            monitor.join()
+            peaks = dict(monitor.peaks)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(timings, elapsed)
+    print_summary(summary, peaks)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "params": vars(args),
+                    "summary": summary,
+                    "rss": {str(pid): peak for pid, peak in peaks.items()},
+                },
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
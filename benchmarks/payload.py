@@ -0,0 +1,155 @@
+import argparse
+import os
+import sys
+import time
+from typing import Callable
+
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+
+# The benchmarks are run from the repository root, like the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from view.encoding import encode_figure
+
+# Largest JSON of each figure as sent to the browser, in bytes
+PAYLOAD_BUDGETS = {
+    "line_noise_level": 60_000,
+    "heatmap_noise_calendar": 70_000,
+    "histo_noise_sensors": 30_000,
+    "map_noise_sensors": 30_000,
+    "noise_distribution": 30_000,
+    "bar_noise_exceedance": 30_000,
+    "scatter_noise_events": 30_000,
+    "scatter_noise_weather": 30_000,
+    "histo_air_rang": 30_000,
+    "map_transport": 30_000,
+}
+
+# --- FIGURES ---
+
+
+def figures() -> dict[str, Callable[[], go.Figure]]:
+    """Data heavy figures of the pages, on the data shipped with the app."""
+    import dash_mantine_components as dmc
+
+    from data.load_and_process_data import gdf_air, gdf_noise
+    from data.meteo import METEO_VARIABLES, get_noise_weather
+    from data.noise import (
+        get_noise_analytics,
+        get_noise_heatmap_cube,
+        get_noise_level_summary,
+        get_noise_sensor_counts,
+        get_noise_sensors,
+        noise_heatmap,
+    )
+    from data.transport import get_transport_data
+    from view.life_quality import (
+        bar_noise_exceedance,
+        heatmap_noise_calendar,
+        histo_air_rang,
+        histo_noise_sensors,
+        line_noise_level,
+        map_noise_sensors,
+        noise_distribution,
+        scatter_noise_events,
+        scatter_noise_weather,
+    )
+    from view.transport import map_transport
+
+    dmc.add_figure_templates()
+    return {
+        "line_noise_level": lambda: line_noise_level(gdf_noise),
+        "heatmap_noise_calendar": lambda: heatmap_noise_calendar(
+            noise_heatmap(), get_noise_heatmap_cube()["days"], ""
+        ),
+        "histo_noise_sensors": lambda: histo_noise_sensors(
+            get_noise_level_summary("TOUS"), "TOUS"
+        ),
+        "map_noise_sensors": lambda: map_noise_sensors(get_noise_sensors()),
+        "noise_distribution": lambda: noise_distribution(get_noise_sensor_counts(), True),
+        "bar_noise_exceedance": lambda: bar_noise_exceedance(
+            get_noise_analytics()["districts"], "district_name"
+        ),
+        "scatter_noise_events": lambda: scatter_noise_events(
+            get_noise_analytics()["events"]
+        ),
+        "scatter_noise_weather": lambda: scatter_noise_weather(
+            get_noise_weather(), "TOUS", "TM", METEO_VARIABLES["TM"]
+        ),
+        "histo_air_rang": lambda: histo_air_rang(gdf_air, "NO2", [10, 40]),
+        "map_transport": lambda: map_transport(
+            get_transport_data()["districts"], "/geojson/district.json", "Age_Percentage"
+        ),
+    }
+
+
+# --- MEASURES ---
+
+
+def _timed(function: Callable[[], str], repeat: int) -> tuple[str, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def measure(fig: go.Figure, repeat: int) -> dict:
+    """
+    JSON size and encode time of a figure, with its arrays as number lists
+    and as typed arrays.
+    """
+    plain, plain_time = _timed(lambda: to_json_plotly(fig.to_dict()), repeat)
+    typed, typed_time = _timed(lambda: to_json_plotly(encode_figure(fig)), repeat)
+    return {
+        "plain_bytes": len(plain.encode()),
+        "plain_time": plain_time,
+        "typed_bytes": len(typed.encode()),
+        "typed_time": typed_time,
+    }
+
+
+def check(results: dict[str, dict]) -> list[str]:
+    """Figures over their payload budget, empty when all are within."""
+    return [
+        f"{name} weighs {result['typed_bytes']} bytes, over its "
+        f"{PAYLOAD_BUDGETS[name]} bytes budget."
+        for name, result in results.items()
+        if result["typed_bytes"] > PAYLOAD_BUDGETS[name]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="JSON size and encode time of the figures, with and without typed arrays."
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="timed encodings per figure")
+    parser.add_argument(
+        "--check", action="store_true", help="exit with an error when over budget"
+    )
+    args = parser.parse_args()
+
+    results = {name: measure(build(), args.repeat) for name, build in figures().items()}
+
+    print(
+        f"{'figure':<26}{'lists [B]':>12}{'typed [B]':>12}{'ratio':>8}"
+        f"{'lists [ms]':>12}{'typed [ms]':>12}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<26}{result['plain_bytes']:>12}{result['typed_bytes']:>12}"
+            f"{result['plain_bytes'] / result['typed_bytes']:>8.1f}"
+            f"{result['plain_time'] * 1000:>12.1f}{result['typed_time'] * 1000:>12.1f}"
+        )
+
+    if args.check:
+        errors = check(results)
+        for error in errors:
+            print(error, file=sys.stderr)
+        sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
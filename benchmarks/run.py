@@ -0,0 +1,249 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+
+# The benchmarks are run from the repository root, like the app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import write_air_data, write_noise_data
+
+RESULTS_PATH = "./benchmarks/results/"
+
+# --- MEASURES ---
+
+
+def payload_bytes(result: Any) -> int:
+    """Size of what a benchmark produces, as sent to the browser or kept in memory."""
+    if isinstance(result, go.Figure):
+        return len(result.to_json())
+    if isinstance(result, str):
+        return len(result.encode())
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(deep=True).sum())
+    if isinstance(result, np.ndarray):
+        return int(result.nbytes)
+    return len(json.dumps(result, cls=PlotlyJSONEncoder))
+
+
+def measure(function: Callable[[], Any], repeat: int) -> dict:
+    """
+    Wall time over `repeat` runs, then the peak of the Python allocations and
+    the payload size of one more traced run.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "time_min": min(times),
+        "time_mean": sum(times) / len(times),
+        "peak_memory": peak,
+        "payload_bytes": payload_bytes(result),
+    }
+
+
+@contextlib.contextmanager
+def working_directory(path: str):
+    # The loaders read hard coded ./data/ paths
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+# --- BENCHMARKS ---
+
+
+def synthetic_benchmarks(root: str) -> dict[str, Callable[[], Any]]:
+    """Loading, aggregation and figures on the synthetic data written under root."""
+    import dash_mantine_components as dmc
+
+    from data.grid import aggregate_layers, build_grid
+    from data.load_and_process_data import load_air_data, load_noise_data
+    from data.noise import (
+        noise_array,
+        noise_level_summary,
+        noise_sensor_counts,
+        noise_sensors,
+    )
+    from view.life_quality import (
+        histo_noise_sensors,
+        line_noise_level,
+        map_air_quality,
+        noise_distribution,
+    )
+
+    dmc.add_figure_templates()
+    with working_directory(root):
+        gdf_noise = load_noise_data()
+        gdf_air = load_air_data()
+    spec, grid = build_grid(250)
+    array = noise_array(gdf_noise)
+    # The most measured source, whichever sources the data holds
+    source = array["sensors"]["source"].mode()[0]
+    counts = noise_sensor_counts(noise_sensors(gdf_noise))
+
+    def in_root(function):
+        def run():
+            with working_directory(root):
+                return function()
+
+        return run
+
+    return {
+        "load_noise_data": in_root(load_noise_data),
+        "load_air_data": in_root(load_air_data),
+        "aggregate_layers": lambda: aggregate_layers(
+            spec, grid, gdf_noise=gdf_noise, gdf_air=gdf_air
+        ),
+        "noise_array": lambda: noise_array(gdf_noise)["levels"],
+        "histo_noise_sensors": lambda: histo_noise_sensors(
+            noise_level_summary(array, "TOUS"), "TOUS"
+        ),
+        "histo_noise_sensors_source": lambda: histo_noise_sensors(
+            noise_level_summary(array, source), source
+        ),
+        "line_noise_level": lambda: line_noise_level(gdf_noise),
+        "noise_sensors": lambda: noise_sensors(gdf_noise),
+        "noise_distribution": lambda: noise_distribution(counts, False),
+        "noise_distribution_district": lambda: noise_distribution(counts, True),
+        "map_air_quality": lambda: map_air_quality(gdf_air, "NO2"),
+    }
+
+
+def page_benchmarks() -> dict[str, Callable[[], Any]]:
+    """
+    Layout of the life quality page, on the data shipped with the app. Raises
+    FileNotFoundError when a dataset of the app is missing.
+    """
+    import app  # noqa: F401, registers the pages
+    from pages.life_quality import layout
+
+    return {"life_quality_layout": lambda: layout().to_plotly_json()}
+
+
+def run(sensors: int, hours: int, segments: int, repeat: int, pages: bool) -> dict:
+    with tempfile.TemporaryDirectory() as root:
+        write_noise_data(root, sensors, hours)
+        write_air_data(root, segments)
+
+        benchmarks = synthetic_benchmarks(root)
+        results = {}
+        if pages:
+            try:
+                benchmarks.update(page_benchmarks())
+            except FileNotFoundError as error:
+                results["pages"] = {"skipped": f"missing {error.filename}"}
+                print("pages", results["pages"], flush=True)
+
+        for name, function in benchmarks.items():
+            try:
+                results[name] = measure(function, repeat)
+            except FileNotFoundError as error:
+                # An asset the benchmark needs is not in this checkout
+                results[name] = {"skipped": f"missing {error.filename}"}
+            except Exception as error:
+                results[name] = {"error": repr(error)}
+            print(name, results[name], flush=True)
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "sensors": sensors,
+            "hours": hours,
+            "segments": segments,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict) -> None:
+    """Print the time and memory ratios of a report against a baseline report."""
+    print(f"\n{'benchmark':<30}{'time':>10}{'memory':>10}{'payload':>10}")
+    for name, result in report["results"].items():
+        before = baseline["results"].get(name, {})
+        if "time_min" not in result or "time_min" not in before:
+            continue
+        print(
+            f"{name:<30}"
+            f"{result['time_min'] / before['time_min']:>10.2f}"
+            f"{result['peak_memory'] / max(before['peak_memory'], 1):>10.2f}"
+            f"{result['payload_bytes'] / max(before['payload_bytes'], 1):>10.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the data loading, aggregation and figure building on synthetic data."
+    )
+    parser.add_argument("--sensors", type=int, default=100, help="number of noise sensors")
+    parser.add_argument(
+        "--hours", type=int, default=24 * 365, help="hours of measures per sensor"
+    )
+    parser.add_argument(
+        "--segments", type=int, default=20_000, help="number of air quality street segments"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument(
+        "--no-pages", action="store_true", help="skip the page layouts on the app data"
+    )
+    parser.add_argument(
+        "--output", default=None, help="results file, by default benchmarks/results/<date>.json"
+    )
+    parser.add_argument("--compare", default=None, help="results file to compare with")
+    args = parser.parse_args()
+
+    report = run(args.sensors, args.hours, args.segments, args.repeat, not args.no_pages)
+
+    output = args.output or os.path.join(
+        RESULTS_PATH, f"{report['date'].replace(':', '-')}_{report['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(output)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+
+    # Failed benchmarks are kept in the report, but fail the run
+    errors = [name for name, result in report["results"].items() if "error" in result]
+    for name in errors:
+        print(f"{name} failed: {report['results'][name]['error']}", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
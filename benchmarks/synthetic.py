@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Noise sources as they are named in the raw files
+NOISE_SOURCES = [
+    "ACTIVITATS / INFRASTRUCTURES ESPORTIVES",
+    "ANIMALS",
+    "NETEJA",
+    "OBRES",
+    "OCI",
+    "PATIS D'ESCOLA",
+    "TRÀNSIT",
+    "XARXA DE TRANSPORT PÚBLIC",
+    "ZONES PEATONALS",
+]
+
+AIR_RANGES = {
+    "no2": [
+        "10-20 µg/m³",
+        "20-30 µg/m³",
+        "30-40 µg/m³",
+        "40-50 µg/m³",
+        "50-60 µg/m³",
+        "60-70 µg/m³",
+        ">70 µg/m³",
+    ],
+    "pm2-5": ["5-10 µg/m³", "10-15 µg/m³", "15-20 µg/m³", "20-25 µg/m³", "25-30 µg/m³"],
+    "pm10": [
+        "<=15 µg/m³",
+        "15-20 µg/m³",
+        "20-25 µg/m³",
+        "25-30 µg/m³",
+        "30-35 µg/m³",
+        "35-40 µg/m³",
+        "> 40 µg/m³",
+    ],
+}
+
+# Extent of Barcelona in EPSG:4326 and EPSG:25831
+BOUNDS_WGS84 = (2.07, 41.32, 2.23, 41.47)
+BOUNDS_ETRS89 = (420_000, 4_574_000, 436_000, 4_591_000)
+
+# --- GENERATORS ---
+
+
+def write_noise_data(
+    root: str, sensors: int, hours: int, seed: int = 0
+) -> None:
+    """
+    Write the raw noise monitoring files of `sensors` sensors measuring for
+    `hours` hours under root/data/noise_monitoring/, with the schema read by
+    load_noise_data.
+    """
+    rng = np.random.default_rng(seed)
+    path = os.path.join(root, "data", "noise_monitoring")
+    os.makedirs(os.path.join(path, "2023"), exist_ok=True)
+
+    ids = np.arange(1, sensors + 1)
+    districts = rng.integers(1, 11, sensors)
+    barris = rng.integers(1, 74, sensors)
+    pd.DataFrame(
+        {
+            "Id_Instal": ids,
+            "Codi_Barri": barris,
+            "Nom_Barri": [f"Barri {code}" for code in barris],
+            "Codi_Districte": districts,
+            "Nom_Districte": [f"District {code}" for code in districts],
+            "Latitud": rng.uniform(BOUNDS_WGS84[1], BOUNDS_WGS84[3], sensors),
+            "Longitud": rng.uniform(BOUNDS_WGS84[0], BOUNDS_WGS84[2], sensors),
+            "Font": rng.choice(NOISE_SOURCES, sensors),
+        }
+    ).to_csv(os.path.join(path, "XarxaSoroll_EquipsMonitor_Instal.csv"), index=False)
+
+    dates = pd.date_range("2023-01-01", periods=hours, freq="h")
+    df = pd.DataFrame(
+        {
+            "Id_Instal": np.repeat(ids, hours),
+            "Any": np.tile(dates.year, sensors),
+            "Mes": np.tile(dates.month, sensors),
+            "Dia": np.tile(dates.day, sensors),
+            "Hora": np.tile(dates.strftime("%-H:00"), sensors),
+            "Nivell_LAeq_1h": rng.normal(60, 8, sensors * hours).round(1),
+        }
+    )
+
+    # The raw data is published in two half-year files
+    first_half = df["Mes"] <= 6
+    df[first_half].to_csv(
+        os.path.join(path, "2023", "2023_1S_XarxaSoroll_EqMonitor_Dades_1Hora.csv"),
+        index=False,
+    )
+    df[~first_half].to_csv(
+        os.path.join(path, "2023", "2023_2S_XarxaSoroll_EqMonitor_Dades_1Hora.csv"),
+        index=False,
+    )
+
+
+def write_air_data(root: str, segments: int, seed: int = 0) -> None:
+    """
+    Write the three raw air quality files of `segments` street segments under
+    root/data/air_quality/2023/, with the schema read by load_air_data.
+    """
+    rng = np.random.default_rng(seed)
+    path = os.path.join(root, "data", "air_quality", "2023")
+    os.makedirs(path, exist_ok=True)
+
+    x = rng.uniform(BOUNDS_ETRS89[0], BOUNDS_ETRS89[2], segments)
+    y = rng.uniform(BOUNDS_ETRS89[1], BOUNDS_ETRS89[3], segments)
+    dx, dy = rng.normal(0, 60, (2, segments))
+    wkt = [
+        f"MultiLineString (({x0:.3f} {y0:.3f}, {x1:.3f} {y1:.3f}))"
+        for x0, y0, x1, y1 in zip(x, y, x + dx, y + dy)
+    ]
+    trams = [f"T{i:06d}" for i in range(segments)]
+
+    for pollutant, ranges in AIR_RANGES.items():
+        # Every range appears at least once, as expected by load_air_data
+        rang = np.concatenate([ranges, rng.choice(ranges, max(segments - len(ranges), 0))])
+        pd.DataFrame(
+            {"TRAM": trams, "Rang": rang[:segments], "GEOM_WKT": wkt}
+        ).to_csv(
+            os.path.join(path, f"2023_tramer_{pollutant}_mapa_qualitat_aire_bcn.csv"),
+            index=False,
+        )
@@ -7,17 +7,38 @@ from dash import (
     callback,
     clientside_callback,
     ALL,
-    Patch,
     callback_context,
 )
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
+import hashlib
+import json
+
 import plotly.io as pio
 
 # --- THEME TOGGLE --- #
 
 dmc.add_figure_templates(default="mantine_dark")
 
+FIGURE_TEMPLATES = {"light": "mantine_light", "dark": "mantine_dark"}
+
+
+def _stamp_templates() -> None:
+    """
+    Write the name and content hash of each template in its layout.meta, so
+    the browser tells which template a figure uses without comparing them.
+    """
+    for name in FIGURE_TEMPLATES.values():
+        template = pio.templates[name]
+        template.layout.meta = None
+        digest = hashlib.sha1(
+            json.dumps(template.to_plotly_json(), sort_keys=True, default=str).encode()
+        ).hexdigest()
+        template.layout.meta = f"{name}:{digest[:12]}"
+
+
+_stamp_templates()
+
 
 def theme_toggle() -> dmc.Switch:
     """
@@ -48,6 +69,14 @@ def theme_toggle() -> dmc.Switch:
     )
 
 
+def figure_templates() -> dict:
+    """The light and dark figure templates, applied in the browser on theme change."""
+    return {
+        theme: pio.templates[name].to_plotly_json()
+        for theme, name in FIGURE_TEMPLATES.items()
+    }
+
+
 # --- APP SHELL --- #
 
 
@@ -147,7 +176,7 @@ def create_app_shell_navbar_children() -> list[dmc.NavLink, dmc.Divider]:
                 width=23,
                 color=dmc.DEFAULT_THEME["colors"]["blue"][6],
             ),
-            href="https://opendata-barcelone.onrender.com/transport",
+            href="/transport",
             id={"type": "navlink_navbar", "index": "/transport"},
         ),
         dmc.NavLink(
@@ -157,7 +186,7 @@ def create_app_shell_navbar_children() -> list[dmc.NavLink, dmc.Divider]:
                 width=23,
                 color=dmc.DEFAULT_THEME["colors"]["blue"][6],
             ),
-            href="https://opendata-barcelone.onrender.com/socio-economic",
+            href="/socio-economic",
             id={"type": "navlink_navbar", "index": "/socio-economic"},
         ),
     ]
@@ -180,6 +209,7 @@ def create_app_shell() -> dmc.AppShell:
         [
             dmc.AppShellHeader(create_app_shell_header()),
             dmc.AppShellMain(page_container.children, id="page-content"),
+            dcc.Store(id="figure-templates", data=figure_templates()),
             dmc.AppShellNavbar(
                 id="navbar",
                 children=create_app_shell_navbar_children(),
@@ -260,23 +290,27 @@ def update_navlink(pathname) -> list[bool]:
     ]
 
 
-@callback(
+# Templates are sent once with the shell, theme changes are applied in the browser.
+# All the graphs of the page are updated in one batch, those without a figure yet or
+# whose template already has the target hash are left untouched.
+clientside_callback(
+    """
+    (theme, figures, templates) => {
+        const template = templates[theme === "light" ? "light" : "dark"];
+        const stamp = (figure) =>
+            figure.layout.template && figure.layout.template.layout
+                ? figure.layout.template.layout.meta
+                : undefined;
+        return figures.map((figure) =>
+            !figure || !figure.layout || stamp(figure) === template.layout.meta
+                ? window.dash_clientside.no_update
+                : {...figure, layout: {...figure.layout, template: template}}
+        );
+    }
+    """,
     Output({"type": "graph", "index": ALL}, "figure", allow_duplicate=True),
     Input("mantine-provider", "forceColorScheme"),
-    State({"type": "graph", "index": ALL}, "id"),
+    State({"type": "graph", "index": ALL}, "figure"),
+    State("figure-templates", "data"),
     prevent_initial_call=True,
 )
-def update_figure(theme, ids) -> list[Patch]:
-    # template must be template object rather than just the template string name
-    template = (
-        pio.templates["mantine_light"]
-        if theme == "light"
-        else pio.templates["mantine_dark"]
-    )
-    patched_figures = []
-    for _ in ids:
-        patched_fig = Patch()
-        patched_fig["layout"]["template"] = template
-        patched_figures.append(patched_fig)
-
-    return patched_figures
@@ -0,0 +1,94 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+DATA_WORKERS = 8
+
+_executor: ThreadPoolExecutor | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_lock = threading.Lock()
+
+# --- CONCURRENT ACCESS ---
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=DATA_WORKERS, thread_name_prefix="data-access"
+        )
+    return _executor
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    # One event loop for the process, running in its own thread, so that a
+    # callback submits its tasks instead of starting and closing a loop
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop.set_default_executor(_get_executor())
+            threading.Thread(
+                target=_loop.run_forever, name="data-access-loop", daemon=True
+            ).start()
+    return _loop
+
+
+def _reset_after_fork() -> None:
+    # A forked server worker does not inherit the threads of its parent
+    global _executor, _loop, _lock
+    _executor = None
+    _loop = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def fetch_async(**tasks: Callable[[], Any]) -> dict[str, Any]:
+    """
+    Awaitable version of fetch, for code already running in an event loop.
+    """
+    loop = asyncio.get_running_loop()
+    futures = [
+        # Each task sees the context of the caller, Flask request included
+        loop.run_in_executor(_get_executor(), contextvars.copy_context().run, task)
+        for task in tasks.values()
+    ]
+    return dict(zip(tasks, await asyncio.gather(*futures)))
+
+
+def fetch(**tasks: Callable[[], Any]) -> dict[str, Any]:
+    """
+    Run independent dataset reads and aggregations concurrently in a shared
+    thread pool, and wait for all of them. The tasks are scheduled on one
+    event loop shared by the whole process. File reads and most of the pandas,
+    numpy and shapely work release the GIL, so a multi-output callback takes
+    the time of its slowest part rather than the sum of them.
+
+    Tasks must not call fetch themselves, as they would wait on the pool they
+    are running in.
+
+    Parameters
+    ----------
+    **tasks : Callable[[], Any]
+        Functions without arguments, keyed by the name of their result.
+
+    Returns
+    -------
+    dict[str, Any]
+        The result of each task under its name. The first exception raised
+        by a task is raised again.
+    """
+    if len(tasks) < 2:
+        return {name: task() for name, task in tasks.items()}
+    # The loop thread has its own context, the caller one is copied here
+    tasks = {
+        name: functools.partial(contextvars.copy_context().run, task)
+        for name, task in tasks.items()
+    }
+    return asyncio.run_coroutine_threadsafe(fetch_async(**tasks), _get_loop()).result()
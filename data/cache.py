@@ -0,0 +1,122 @@
+import os
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+
+CACHE_PATH = "./data/cache/"
+
+# Functions called with "disk" or "build" each time an artifact is served
+_listeners: list[Callable[[str], None]] = []
+
+# --- DERIVED ARTIFACTS ---
+
+
+def add_cache_listener(listener: Callable[[str], None]) -> None:
+    """
+    Register a function notified of every load_or_build call, with "disk"
+    when the artifact is read from the cache and "build" when it is computed.
+    """
+    _listeners.append(listener)
+
+
+def _notify(status: str) -> None:
+    for listener in _listeners:
+        listener(status)
+
+
+def artifact_path(name: str, extension: str = "pkl") -> str:
+    """
+    Return the path of a derived artifact stored in the cache directory.
+
+    Parameters
+    ----------
+    name : str
+        Name of the artifact, without extension.
+    extension : str, optional
+        File extension of the artifact, by default "pkl".
+
+    Returns
+    -------
+    str
+        The path of the artifact.
+    """
+    return f"{CACHE_PATH}{name}.{extension}"
+
+
+def is_fresh(path: str, sources: Iterable[str] = ()) -> bool:
+    """
+    Check whether an artifact exists and is newer than all of its sources.
+    Missing sources are ignored, so an artifact shipped without its raw data
+    stays valid.
+
+    Parameters
+    ----------
+    path : str
+        Path of the artifact.
+    sources : Iterable[str], optional
+        Paths of the raw files the artifact is derived from.
+
+    Returns
+    -------
+    bool
+        True if the artifact can be reused as is.
+    """
+    if not os.path.exists(path):
+        return False
+
+    built_at = os.path.getmtime(path)
+    return all(
+        os.path.getmtime(source) <= built_at
+        for source in sources
+        if os.path.exists(source)
+    )
+
+
+def load_or_build(
+    name: str,
+    build: Callable[[], Any],
+    sources: Iterable[str] = (),
+    extension: str = "pkl",
+) -> Any:
+    """
+    Load a derived artifact from the cache, building and saving it first if it
+    is missing or older than its sources. Tabular artifacts can be stored in a
+    columnar parquet file rather than a pickle.
+
+    Parameters
+    ----------
+    name : str
+        Name of the artifact, without extension.
+    build : Callable[[], Any]
+        Function computing the artifact.
+    sources : Iterable[str], optional
+        Paths of the raw files the artifact is derived from.
+    extension : str, optional
+        "pkl" for any object or "parquet" for a DataFrame, by default "pkl".
+
+    Returns
+    -------
+    Any
+        The artifact.
+    """
+    if extension not in ["pkl", "parquet"]:
+        raise ValueError(f"extension {extension} not in available extensions.")
+
+    path = artifact_path(name, extension)
+    if is_fresh(path, sources):
+        _notify("disk")
+        return pd.read_pickle(path) if extension == "pkl" else pd.read_parquet(path)
+
+    _notify("build")
+    artifact = build()
+    os.makedirs(CACHE_PATH, exist_ok=True)
+
+    # Write to a temporary file first so concurrent workers never read a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if extension == "pkl":
+        pd.to_pickle(artifact, tmp_path)
+    else:
+        artifact.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+    return artifact
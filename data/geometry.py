@@ -0,0 +1,81 @@
+import json
+from functools import lru_cache
+
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+DATA_PATH = "./data/"
+
+DISTRICT_FILE = DATA_PATH + "district_zone/BarcelonaCiutat_Districtes.csv"
+BARRI_FILE = DATA_PATH + "pred/BarcelonaCiutat_Barris.csv"
+
+ZONE_FILES = {"district": DISTRICT_FILE, "barri": BARRI_FILE}
+
+# Code and name columns of each zoning, and the WKT column holding each CRS
+ZONE_COLUMNS = {
+    "district": ("Codi_Districte", "nom_districte"),
+    "barri": ("codi_barri", "nom_barri"),
+}
+WKT_COLUMNS = {"EPSG:4326": "geometria_wgs84", "EPSG:25831": "geometria_etrs89"}
+
+# --- ZONES ---
+
+
+@lru_cache(maxsize=None)
+def _read_zones(level: str) -> dict[str, gpd.GeoDataFrame]:
+    if level not in ZONE_FILES:
+        raise ValueError(f"level {level} not in available levels.")
+
+    code, name = ZONE_COLUMNS[level]
+    df = pd.read_csv(
+        ZONE_FILES[level],
+        usecols=[code, name, *WKT_COLUMNS.values()],
+        dtype={code: "int8"},
+    )
+    attributes = df[[code, name]].set_axis(["code", "name"], axis="columns")
+
+    return {
+        crs: gpd.GeoDataFrame(
+            attributes, geometry=shapely.from_wkt(df[column].values), crs=crs
+        )
+        for crs, column in WKT_COLUMNS.items()
+    }
+
+
+def get_zones(level: str, crs: str = "EPSG:4326") -> gpd.GeoDataFrame:
+    """
+    District or barri polygons, parsed once per process from both WKT columns
+    of the source file and shared by every loader and figure.
+
+    The frame is returned by reference: callers derive new frames from it
+    (merge, join, to_crs) instead of adding columns in place.
+
+    Parameters
+    ----------
+    level : str
+        "district" or "barri".
+    crs : str
+        "EPSG:4326" or "EPSG:25831".
+
+    Returns
+    -------
+    gpd.GeoDataFrame
+        One row per zone with its "code", "name" and geometry.
+    """
+    zones = _read_zones(level)
+    if crs not in zones:
+        raise ValueError(f"crs {crs} not in available crs.")
+    return zones[crs]
+
+
+@lru_cache(maxsize=None)
+def get_zones_geojson(level: str) -> dict:
+    """Zones in EPSG:4326 as a GeoJSON dict whose feature ids are the zone codes."""
+    return get_zones(level).set_index("code").geometry.__geo_interface__
+
+
+@lru_cache(maxsize=None)
+def get_zones_geojson_bytes(level: str) -> bytes:
+    """The GeoJSON of the zones serialized once, ready to be served as is."""
+    return json.dumps(get_zones_geojson(level), separators=(",", ":")).encode()
@@ -0,0 +1,353 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from data.cache import load_or_build
+from data.geometry import DISTRICT_FILE, get_zones
+from data.trees import TREE_FILES
+
+DATA_PATH = "./data/"
+GRID_CRS = "EPSG:25831"
+
+# Cell size in meters (circumradius for hexagons, side for squares) per map zoom level
+ZOOM_RESOLUTIONS = {10: 1000, 11: 700, 12: 400, 13: 200, 14: 100}
+
+POLLUTANTS = ["NO2", "PM10", "PM2_5"]
+
+# Layers drawn on the grid map, with their label
+GRID_METRICS = {
+    "trees": "Nombre d'arbres",
+    "vegetation_index": "Indice de végétation",
+    "NO2": "Classe moyenne de NO2",
+    "PM10": "Classe moyenne de PM10",
+    "PM2_5": "Classe moyenne de PM2.5",
+    "noise_level": "Niveau de bruit moyen [dB]",
+    "hospital_distance": "Distance à l'hôpital le plus proche [m]",
+}
+
+_SQRT3 = np.sqrt(3)
+_KEY_OFFSET = 1 << 19
+
+# --- GRID GEOMETRY ---
+
+
+@dataclass(frozen=True)
+class GridSpec:
+    kind: str
+    resolution: float
+    origin: tuple[float, float]
+
+    def __post_init__(self):
+        if self.kind not in ["hex", "square"]:
+            raise ValueError(f"grid kind {self.kind} not in available kinds.")
+
+    def cell_coords(self, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Assign projected coordinates to the integer coordinates of their cell,
+        axial (q, r) for hexagons and (column, row) for squares.
+        """
+        x = (np.asarray(x, dtype="float64") - self.origin[0]) / self.resolution
+        y = (np.asarray(y, dtype="float64") - self.origin[1]) / self.resolution
+
+        if self.kind == "square":
+            return np.floor(x).astype("int64"), np.floor(y).astype("int64")
+
+        # Pointy-top hexagons: fractional axial coordinates then cube rounding
+        q = _SQRT3 / 3 * x - y / 3
+        r = 2 / 3 * y
+        s = -q - r
+        rq, rr, rs = np.round(q), np.round(r), np.round(s)
+        dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+
+        fix_q = (dq > dr) & (dq > ds)
+        fix_r = ~fix_q & (dr > ds)
+        rq = np.where(fix_q, -rr - rs, rq)
+        rr = np.where(fix_r, -rq - rs, rr)
+
+        return rq.astype("int64"), rr.astype("int64")
+
+    def cell_keys(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        q, r = self.cell_coords(x, y)
+        return ((q + _KEY_OFFSET) << 20) | (r + _KEY_OFFSET)
+
+    def cell_centers(self, q: np.ndarray, r: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if self.kind == "square":
+            x, y = q + 0.5, r + 0.5
+        else:
+            x, y = _SQRT3 * (q + r / 2), 1.5 * r
+
+        return (
+            x * self.resolution + self.origin[0],
+            y * self.resolution + self.origin[1],
+        )
+
+    def cell_polygons(self, q: np.ndarray, r: np.ndarray) -> np.ndarray:
+        x, y = self.cell_centers(q, r)
+
+        if self.kind == "square":
+            corners = np.array([[-0.5, -0.5], [0.5, -0.5], [0.5, 0.5], [-0.5, 0.5]])
+        else:
+            angles = np.deg2rad(30 + 60 * np.arange(6))
+            corners = np.column_stack([np.cos(angles), np.sin(angles)])
+
+        rings = np.stack([x, y], axis=-1)[:, None, :] + corners * self.resolution
+        return shapely.polygons(rings)
+
+
+def load_city_boundary() -> shapely.Geometry:
+    return shapely.union_all(get_zones("district", GRID_CRS).geometry.values)
+
+
+def build_grid(
+    resolution: float, kind: str = "hex", boundary: shapely.Geometry = None
+) -> tuple[GridSpec, gpd.GeoDataFrame]:
+    """
+    Build the cells of a hexagonal or square grid covering Barcelona.
+
+    Parameters
+    ----------
+    resolution : float
+        Cell size in meters, circumradius for hexagons and side for squares.
+    kind : str, optional
+        "hex" or "square", by default "hex".
+    boundary : shapely.Geometry, optional
+        Area to cover in EPSG:25831, by default the city limits.
+
+    Returns
+    -------
+    tuple[GridSpec, gpd.GeoDataFrame]
+        The grid specification and one row per cell intersecting the boundary,
+        indexed by cell key.
+    """
+    boundary = load_city_boundary() if boundary is None else boundary
+    minx, miny, maxx, maxy = boundary.bounds
+
+    # Snap the origin on the resolution so cell keys are stable between builds
+    origin = (
+        np.floor(minx / resolution) * resolution,
+        np.floor(miny / resolution) * resolution,
+    )
+    spec = GridSpec(kind, resolution, origin)
+
+    width = (maxx - origin[0]) / resolution
+    height = (maxy - origin[1]) / resolution
+    if kind == "square":
+        q, r = np.meshgrid(np.arange(np.ceil(width)), np.arange(np.ceil(height)))
+    else:
+        columns, r = np.meshgrid(
+            np.arange(-1, np.ceil(width / _SQRT3) + 2),
+            np.arange(np.ceil(height / 1.5) + 2),
+        )
+        q = columns - r // 2
+    q, r = q.ravel().astype("int64"), r.ravel().astype("int64")
+
+    polygons = spec.cell_polygons(q, r)
+    shapely.prepare(boundary)
+    inside = shapely.intersects(boundary, polygons)
+    q, r = q[inside], r[inside]
+    x, y = spec.cell_centers(q, r)
+
+    grid = gpd.GeoDataFrame(
+        {"x": x, "y": y},
+        index=pd.Index(
+            ((q + _KEY_OFFSET) << 20) | (r + _KEY_OFFSET), name="cell"
+        ),
+        geometry=polygons[inside],
+        crs=GRID_CRS,
+    )
+    return spec, grid
+
+
+def resolution_for_zoom(zoom: float) -> int:
+    levels = sorted(ZOOM_RESOLUTIONS)
+    level = max([lvl for lvl in levels if lvl <= zoom], default=levels[0])
+    return ZOOM_RESOLUTIONS[level]
+
+
+# --- AGGREGATIONS ---
+
+
+def cell_positions(
+    spec: GridSpec, grid: gpd.GeoDataFrame, x: np.ndarray, y: np.ndarray
+) -> np.ndarray:
+    """Row of the grid containing each point, -1 for points outside the grid."""
+    return grid.index.get_indexer(spec.cell_keys(x, y))
+
+
+def _sum_per_cell(positions: np.ndarray, n_cells: int, weights=None) -> np.ndarray:
+    inside = positions >= 0
+    if weights is not None:
+        weights = np.asarray(weights, dtype="float64")[inside]
+    return np.bincount(positions[inside], weights=weights, minlength=n_cells)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def count_points(
+    spec: GridSpec, grid: gpd.GeoDataFrame, x: np.ndarray, y: np.ndarray
+) -> np.ndarray:
+    return _sum_per_cell(cell_positions(spec, grid, x, y), len(grid))
+
+
+def aggregate_air(
+    spec: GridSpec, grid: gpd.GeoDataFrame, gdf_air: gpd.GeoDataFrame
+) -> pd.DataFrame:
+    """
+    Segment-length-weighted mean pollutant class per cell. Classes are the
+    ordered category codes (0 for the cleanest range), each segment is
+    assigned to the cell containing its midpoint.
+    """
+    lines = gdf_air.geometry.to_crs(GRID_CRS).values
+    midpoints = shapely.line_interpolate_point(lines, 0.5, normalized=True)
+    lengths = shapely.length(lines)
+    positions = cell_positions(
+        spec, grid, shapely.get_x(midpoints), shapely.get_y(midpoints)
+    )
+
+    total_length = _sum_per_cell(positions, len(grid), lengths)
+    df = pd.DataFrame({"air_length": total_length}, index=grid.index)
+    for pollutant in POLLUTANTS:
+        codes = gdf_air[pollutant].cat.codes.values.astype("float64")
+        known = codes >= 0
+        df[pollutant] = _ratio(
+            _sum_per_cell(positions[known], len(grid), (codes * lengths)[known]),
+            _sum_per_cell(positions[known], len(grid), lengths[known]),
+        )
+    return df
+
+
+def aggregate_noise(
+    spec: GridSpec, grid: gpd.GeoDataFrame, gdf_noise: gpd.GeoDataFrame
+) -> pd.DataFrame:
+    """Mean hourly noise level of the sensors located in each cell."""
+    sensors = gdf_noise.groupby("id", observed=True).agg(
+        noise_sum=("noise_level", "sum"),
+        noise_count=("noise_level", "count"),
+        geometry=("geometry", "first"),
+    )
+    points = gpd.GeoSeries(sensors["geometry"], crs=gdf_noise.crs).to_crs(GRID_CRS)
+    positions = cell_positions(spec, grid, points.x.values, points.y.values)
+
+    return pd.DataFrame(
+        {
+            "noise_sensors": _sum_per_cell(positions, len(grid)),
+            "noise_level": _ratio(
+                _sum_per_cell(positions, len(grid), sensors["noise_sum"].values),
+                _sum_per_cell(positions, len(grid), sensors["noise_count"].values),
+            ),
+        },
+        index=grid.index,
+    )
+
+
+def nearest_distance(grid: gpd.GeoDataFrame, gdf: gpd.GeoDataFrame) -> np.ndarray:
+    """Distance in meters from each cell center to the nearest point of gdf."""
+    points = gdf.geometry.to_crs(GRID_CRS)
+    dx = grid["x"].values[:, None] - points.x.values[None, :]
+    dy = grid["y"].values[:, None] - points.y.values[None, :]
+    return np.hypot(dx, dy).min(axis=1)
+
+
+def mean_nearest_distance(
+    gdf: gpd.GeoDataFrame, level: str = "district", resolution: float = 100
+) -> pd.Series:
+    """
+    Mean distance from any point of each zone to the nearest point of gdf,
+    estimated on the centers of a regular square grid.
+
+    Returns
+    -------
+    pd.Series
+        The mean distance in meters, indexed by zone code.
+    """
+    zones = get_zones(level, GRID_CRS)
+    _, grid = build_grid(resolution, "square")
+
+    centers = shapely.points(grid["x"].values, grid["y"].values)
+    center_index, zone_index = shapely.STRtree(zones.geometry.values).query(
+        centers, predicate="within"
+    )
+    distances = nearest_distance(grid.iloc[center_index], gdf)
+
+    totals = np.bincount(zone_index, distances, minlength=len(zones))
+    counts = np.bincount(zone_index, minlength=len(zones))
+    return pd.Series(totals / counts, index=zones["code"].values, name="mean_distance")
+
+
+def aggregate_layers(
+    spec: GridSpec,
+    grid: gpd.GeoDataFrame,
+    gdf_noise: gpd.GeoDataFrame = None,
+    gdf_air: gpd.GeoDataFrame = None,
+    df_trees: pd.DataFrame = None,
+    gdf_hospitals: gpd.GeoDataFrame = None,
+) -> gpd.GeoDataFrame:
+    """
+    Bin every available layer on the grid, each in a single vectorized pass.
+    Trees are given as a DataFrame of EPSG:25831 "x" and "y" coordinates.
+
+    Returns
+    -------
+    gpd.GeoDataFrame
+        The grid cells in EPSG:4326 with one column per aggregated metric.
+    """
+    layers = grid.drop(columns=["x", "y"])
+    if df_trees is not None:
+        layers["trees"] = count_points(
+            spec, grid, df_trees["x"].values, df_trees["y"].values
+        )
+    if gdf_air is not None:
+        layers = layers.join(aggregate_air(spec, grid, gdf_air))
+    if gdf_noise is not None:
+        layers = layers.join(aggregate_noise(spec, grid, gdf_noise))
+    if gdf_hospitals is not None:
+        layers["hospital_distance"] = nearest_distance(grid, gdf_hospitals)
+
+    return layers.to_crs(epsg=4326)
+
+
+@lru_cache(maxsize=None)
+def get_grid_layers(resolution: int, kind: str = "hex") -> gpd.GeoDataFrame:
+    """
+    Grid layers at the given resolution, cached on disk and in memory.
+    """
+
+    def build() -> gpd.GeoDataFrame:
+        from data.load_and_process_data import gdf_air, gdf_noise, load_hospital_data
+        from data.trees import get_tree_data
+        from data.vegetation import get_vegetation_grid
+
+        spec, grid = build_grid(resolution, kind)
+        layers = aggregate_layers(
+            spec,
+            grid,
+            gdf_noise=gdf_noise,
+            gdf_air=gdf_air,
+            df_trees=get_tree_data(),
+            gdf_hospitals=load_hospital_data(),
+        )
+        return layers.join(get_vegetation_grid(resolution, kind)["vegetation_index"])
+
+    return load_or_build(
+        f"grid_{kind}_{resolution}",
+        build,
+        sources=[
+            DISTRICT_FILE,
+            DATA_PATH + "noise_monitoring/noise_data.pkl",
+            DATA_PATH + "air_quality/air_data.pkl",
+            *TREE_FILES.values(),
+            DATA_PATH + "trees/no_vegetation/2017_vegetacio.gpkg",
+            DATA_PATH + "hospital/opendatabcn_sanitat_hospitals-i-centres-atencio-primaria.csv",
+        ],
+    )
+
+
+def get_grid_layers_for_zoom(zoom: float, kind: str = "hex") -> gpd.GeoDataFrame:
+    return get_grid_layers(resolution_for_zoom(zoom), kind)
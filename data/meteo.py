@@ -0,0 +1,114 @@
+from functools import lru_cache
+
+import pandas as pd
+import geopandas as gpd
+
+from data.cache import load_or_build
+
+DATA_PATH = "./data/"
+
+METEO_FILE = DATA_PATH + "meteorological_stations/2023/2023_MeteoCat_Detall_Estacions.csv"
+
+METEO_VARIABLES = {
+    "TM": "Température moyenne [°C]",
+    "TX": "Température maximale [°C]",
+    "TN": "Température minimale [°C]",
+    "HRM": "Humidité relative moyenne [%]",
+    "PPT": "Précipitations [mm]",
+    "PM": "Pression atmosphérique moyenne [hPa]",
+    "RS24h": "Irradiation solaire [MJ/m²]",
+    "VVM10": "Vitesse moyenne du vent [m/s]",
+}
+
+# --- STATIONS ---
+
+
+def load_meteo_data() -> pd.DataFrame:
+    """
+    Pivot the long-format daily station readings into a wide table.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per day and one float32 column per (station, variable).
+    """
+    df = pd.read_csv(
+        METEO_FILE,
+        usecols=["DATA_LECTURA", "CODI_ESTACIO", "ACRÒNIM", "VALOR"],
+        dtype={"CODI_ESTACIO": "category", "ACRÒNIM": "category", "VALOR": "float32"},
+        parse_dates=["DATA_LECTURA"],
+    ).rename(
+        columns={
+            "DATA_LECTURA": "date",
+            "CODI_ESTACIO": "station",
+            "ACRÒNIM": "variable",
+            "VALOR": "value",
+        }
+    )
+
+    return (
+        df.pivot(index="date", columns=["station", "variable"], values="value")
+        .sort_index(axis="index")
+        .sort_index(axis="columns")
+        .astype("float32")
+    )
+
+
+@lru_cache(maxsize=1)
+def get_meteo_data() -> pd.DataFrame:
+    return load_or_build("meteo_wide", load_meteo_data, [METEO_FILE])
+
+
+def city_weather(df: pd.DataFrame) -> pd.DataFrame:
+    """Daily mean over the stations measuring each variable."""
+    return df.T.groupby(level="variable", observed=True).mean().T
+
+
+# --- NOISE JOIN ---
+
+
+def hourly_noise(gdf_noise: gpd.GeoDataFrame) -> pd.DataFrame:
+    """Mean hourly noise level per source, plus all the sources as "TOUS"."""
+    per_source = (
+        gdf_noise.groupby(["date", "source"], observed=True)["noise_level"]
+        .mean()
+        .reset_index()
+    )
+    all_sources = (
+        gdf_noise.groupby("date")["noise_level"].mean().reset_index().assign(source="TOUS")
+    )
+
+    return pd.concat([per_source, all_sources], ignore_index=True).astype(
+        {"source": "category"}
+    )
+
+
+def join_noise_weather(df_noise: pd.DataFrame, df_weather: pd.DataFrame) -> pd.DataFrame:
+    """
+    As-of join of hourly noise levels on the daily weather: each hour gets the
+    readings of the day it belongs to, through a single sorted merge.
+    """
+    return pd.merge_asof(
+        df_noise.sort_values("date"),
+        df_weather.rename_axis("date").reset_index().sort_values("date"),
+        on="date",
+        direction="backward",
+        tolerance=pd.Timedelta(days=1),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_noise_weather() -> pd.DataFrame:
+    def build() -> pd.DataFrame:
+        from data.load_and_process_data import gdf_noise
+
+        return join_noise_weather(
+            hourly_noise(gdf_noise),
+            city_weather(get_meteo_data())[list(METEO_VARIABLES)],
+        )
+
+    return load_or_build(
+        "noise_weather",
+        build,
+        [METEO_FILE, DATA_PATH + "noise_monitoring/noise_data.pkl"],
+    )
@@ -0,0 +1,497 @@
+import warnings
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from data.cache import load_or_build
+
+DATA_PATH = "./data/"
+NOISE_FILE = DATA_PATH + "noise_monitoring/noise_data.pkl"
+
+# Thresholds drawn on the noise histograms [dB]
+THRESHOLDS = [40, 50, 60, 70, 80, 90]
+
+# Day, evening and night periods of the Lden with their penalty [dB]
+PERIODS = {
+    "day": (range(7, 19), 0),
+    "evening": (range(19, 23), 5),
+    "night": (list(range(23, 24)) + list(range(0, 7)), 10),
+}
+
+# Anomalies: hours more than Z_THRESHOLD standard deviations above the
+# mean of the WINDOW previous hours of the same sensor
+WINDOW = 7 * 24
+MIN_WINDOW_HOURS = 24
+Z_THRESHOLD = 3.0
+
+# Histograms of the hourly levels: bin width [dB] and outliers drawn at most
+HISTOGRAM_BIN = 0.5
+MAX_OUTLIERS = 50
+
+SENSOR_COLUMNS = ["id", "source", "district_code", "district_name", "area_code", "area_name"]
+
+# --- SENSOR DIMENSION ---
+
+
+def noise_sensors(gdf_noise: gpd.GeoDataFrame) -> pd.DataFrame:
+    """
+    One row per sensor installation, sorted by id: its source, district,
+    barri (area) and position.
+    """
+    first = gdf_noise.drop_duplicates("id")
+    return (
+        pd.DataFrame(first[SENSOR_COLUMNS])
+        .assign(lon=first.geometry.x.to_numpy(), lat=first.geometry.y.to_numpy())
+        .sort_values("id")
+        .reset_index(drop=True)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_noise_sensors() -> pd.DataFrame:
+    def build() -> pd.DataFrame:
+        from data.load_and_process_data import gdf_noise
+
+        return noise_sensors(gdf_noise)
+
+    return load_or_build("noise_sensors", build, [NOISE_FILE])
+
+
+def noise_sensor_counts(sensors: pd.DataFrame) -> dict:
+    """
+    Number of sensors of each level of the district > source hierarchy.
+
+    Returns
+    -------
+    dict
+        "source", "district" and "district_source" DataFrames with their
+        labels and a "count" column.
+    """
+    def counts(by: list[str]) -> pd.DataFrame:
+        return (
+            sensors.groupby(by, observed=True)
+            .size()
+            .rename("count")
+            .sort_values(ascending=False)
+            .reset_index()
+        )
+
+    return {
+        "source": counts(["source"]),
+        "district": counts(["district_name"]),
+        "district_source": counts(["district_name", "source"]),
+    }
+
+
+@lru_cache(maxsize=1)
+def get_noise_sensor_counts() -> dict:
+    return noise_sensor_counts(get_noise_sensors())
+
+
+# --- SENSOR-MAJOR ARRAY ---
+
+
+def noise_array(gdf_noise: gpd.GeoDataFrame) -> dict:
+    """
+    Hourly noise levels as a dense (sensor, hour) array, missing hours being
+    NaN. Rows are scattered in place from their integer codes, no pivot.
+
+    Returns
+    -------
+    dict
+        "levels" the float32 array, "hours" the DatetimeIndex of its columns
+        and "sensors" one row per sensor with its source and zones.
+    """
+    sensors = noise_sensors(gdf_noise)[SENSOR_COLUMNS]
+    sensor_codes = pd.Categorical(
+        gdf_noise["id"], categories=sensors["id"].to_numpy()
+    ).codes
+
+    start = gdf_noise["date"].min().floor("h")
+    hours = pd.date_range(start, gdf_noise["date"].max().floor("h"), freq="h")
+    hour_codes = (
+        (gdf_noise["date"].to_numpy() - start.to_datetime64()) // np.timedelta64(1, "h")
+    ).astype("int64")
+
+    levels = np.full((len(sensors), len(hours)), np.nan, dtype="float32")
+    levels[sensor_codes, hour_codes] = gdf_noise["noise_level"].to_numpy()
+    return {"levels": levels, "hours": hours, "sensors": sensors}
+
+
+@lru_cache(maxsize=1)
+def get_noise_array() -> dict:
+    def build() -> dict:
+        from data.load_and_process_data import gdf_noise
+
+        return noise_array(gdf_noise)
+
+    return load_or_build("noise_array", build, [NOISE_FILE])
+
+
+# --- HEATMAP CUBE ---
+
+
+def noise_heatmap_cube(array: dict) -> dict:
+    """
+    Sums and counts of the hourly levels per source, district, day and hour
+    of day, each in one contiguous array of shape (sources, districts, days,
+    24). A filter slices and sums them instead of regrouping the hourly table.
+
+    Returns
+    -------
+    dict
+        "sums" and "counts" the arrays, "sources" and "districts" the labels
+        of their first axes and "days" the DatetimeIndex of the third one.
+    """
+    levels, hours, sensors = array["levels"], array["hours"], array["sensors"]
+
+    # Whole days, the hours before the first measure being missing
+    offset = hours[0].hour
+    n_days = -(-(offset + len(hours)) // 24)
+    daily = np.full((len(sensors), n_days * 24), np.nan, dtype="float32")
+    daily[:, offset : offset + len(hours)] = levels
+    daily = daily.reshape(len(sensors), n_days, 24)
+
+    source_codes, sources = pd.factorize(sensors["source"].astype(str), sort=True)
+    district_codes, districts = pd.factorize(sensors["district_name"], sort=True)
+    shape = (len(sources), len(districts), n_days, 24)
+    sums = np.zeros(shape, dtype="float32")
+    counts = np.zeros(shape, dtype="uint16")
+    np.add.at(sums, (source_codes, district_codes), np.nan_to_num(daily))
+    np.add.at(counts, (source_codes, district_codes), ~np.isnan(daily))
+    return {
+        "sums": sums,
+        "counts": counts,
+        "sources": list(sources),
+        "districts": list(districts),
+        "days": pd.date_range(hours[0].normalize(), periods=n_days, freq="D"),
+    }
+
+
+@lru_cache(maxsize=1)
+def get_noise_heatmap_cube() -> dict:
+    return load_or_build(
+        "noise_heatmap_cube", lambda: noise_heatmap_cube(get_noise_array()), [NOISE_FILE]
+    )
+
+
+def noise_heatmap_districts(source: str = "TOUS") -> list[str]:
+    """Districts having at least one measure of the source, "TOUS" for all."""
+    cube = get_noise_heatmap_cube()
+    if source != "TOUS" and source not in cube["sources"]:
+        raise ValueError(f"source {source} not in available sources.")
+
+    measured = cube["counts"].any(axis=(2, 3))
+    if source != "TOUS":
+        measured = measured[cube["sources"].index(source)]
+    else:
+        measured = measured.any(axis=0)
+    return [district for district, has in zip(cube["districts"], measured) if has]
+
+
+def noise_heatmap(source: str = "TOUS", district: str = "TOUS") -> np.ndarray:
+    """
+    Mean level of the sensors of a source and a district, "TOUS" for all of
+    them, per day and hour of day.
+
+    Returns
+    -------
+    np.ndarray
+        float32 array of shape (days, 24), NaN where nothing was measured.
+    """
+    cube = get_noise_heatmap_cube()
+    if source != "TOUS" and source not in cube["sources"]:
+        raise ValueError(f"source {source} not in available sources.")
+    if district != "TOUS" and district not in cube["districts"]:
+        raise ValueError(f"district {district} not in available districts.")
+
+    index = (
+        slice(None) if source == "TOUS" else cube["sources"].index(source),
+        slice(None) if district == "TOUS" else cube["districts"].index(district),
+    )
+    sums, counts = cube["sums"][index], cube["counts"][index]
+    while sums.ndim > 2:
+        sums, counts = sums.sum(axis=0), counts.sum(axis=0)
+    with np.errstate(invalid="ignore"):
+        return (sums / counts).astype("float32")
+
+
+# --- DISTRIBUTION SUMMARIES ---
+
+
+def distribution_summary(
+    values: np.ndarray, bin_size: float = HISTOGRAM_BIN, max_outliers: int = MAX_OUTLIERS
+) -> dict:
+    """
+    Histogram and box plot statistics of values, so a figure draws them
+    without receiving the values. Whiskers end at the furthest values within
+    1.5 interquartile ranges of the box, like plotly's.
+
+    Returns
+    -------
+    dict
+        "edges" and "counts" of the bins, "q1", "median", "q3", "lowerfence",
+        "upperfence" and "mean" of the box, the "outliers" furthest from the
+        median, at most max_outliers, and "n_outliers" their total number.
+    """
+    values = values[~np.isnan(values)]
+    edges = np.arange(
+        np.floor(values.min() / bin_size) * bin_size,
+        values.max() + bin_size,
+        bin_size,
+    )
+    counts, edges = np.histogram(values, bins=edges)
+
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    inside = values[(values >= q1 - 1.5 * (q3 - q1)) & (values <= q3 + 1.5 * (q3 - q1))]
+    outliers = values[(values < inside.min()) | (values > inside.max())]
+    furthest = outliers[np.argsort(-np.abs(outliers - median))[:max_outliers]]
+    return {
+        "edges": edges.astype("float32"),
+        "counts": counts.astype("int32"),
+        "q1": float(q1),
+        "median": float(median),
+        "q3": float(q3),
+        "lowerfence": float(inside.min()),
+        "upperfence": float(inside.max()),
+        "mean": float(values.mean()),
+        "outliers": np.sort(furthest).astype("float32"),
+        "n_outliers": len(outliers),
+    }
+
+
+def noise_level_summary(array: dict, source: str = "TOUS") -> dict:
+    """Distribution of the hourly mean level of the sensors of a source."""
+    levels, sensors = array["levels"], array["sensors"]
+    if source != "TOUS":
+        if source not in set(sensors["source"]):
+            raise ValueError(f"source {source} not in available sources.")
+        levels = levels[(sensors["source"] == source).to_numpy()]
+    with warnings.catch_warnings():
+        # Hours measured by none of the sensors
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return distribution_summary(np.nanmean(levels, axis=0))
+
+
+@lru_cache(maxsize=None)
+def get_noise_level_summary(source: str = "TOUS") -> dict:
+    return noise_level_summary(get_noise_array(), source)
+
+
+# --- INDICATORS ---
+
+
+def noise_accumulators(levels: np.ndarray, hours: pd.DatetimeIndex) -> dict:
+    """
+    Additive statistics of a block of hours, from which the indicators are
+    derived. The accumulators of consecutive blocks are summed with
+    merge_accumulators, so new measures never require a full recomputation.
+
+    Returns
+    -------
+    dict
+        Per sensor: "exceedances" the hours at or above each threshold,
+        "energy" the sum of 10^(L/10) and "counts" the measured hours of each
+        period.
+    """
+    measured = ~np.isnan(levels)
+    energy = np.where(measured, 10 ** (levels.astype("float64") / 10), 0)
+
+    exceedances = np.stack(
+        [(levels >= threshold).sum(axis=1) for threshold in THRESHOLDS], axis=1
+    )
+    masks = [np.isin(hours.hour, period) for period, _ in PERIODS.values()]
+    return {
+        "exceedances": exceedances.astype("int32"),
+        "energy": np.stack([energy[:, mask].sum(axis=1) for mask in masks], axis=1),
+        "counts": np.stack([measured[:, mask].sum(axis=1) for mask in masks], axis=1),
+    }
+
+
+def merge_accumulators(a: dict, b: dict) -> dict:
+    return {key: a[key] + b[key] for key in a}
+
+
+def _decibels(energy: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 10 * np.log10(energy / counts)
+
+
+def noise_indicators(accumulators: dict, sensors: pd.DataFrame) -> pd.DataFrame:
+    """
+    Exceedance hours and day, evening, night and Lden levels of each sensor.
+    The period levels are energy averages, the Lden weights them by their
+    duration with their penalty.
+    """
+    levels = _decibels(accumulators["energy"], accumulators["counts"])
+    durations = np.array([len(period) for period, _ in PERIODS.values()])
+    penalties = np.array([penalty for _, penalty in PERIODS.values()])
+    lden = 10 * np.log10(
+        (durations * 10 ** ((levels + penalties) / 10)).sum(axis=1) / durations.sum()
+    )
+
+    df = sensors.copy()
+    df["hours"] = accumulators["counts"].sum(axis=1)
+    for i, threshold in enumerate(THRESHOLDS):
+        df[f"over_{threshold}"] = accumulators["exceedances"][:, i]
+    for i, period in enumerate(PERIODS):
+        df[f"L{period}"] = levels[:, i].astype("float32")
+    df["Lden"] = lden.astype("float32")
+    return df
+
+
+def group_indicators(indicators: pd.DataFrame, by: str) -> pd.DataFrame:
+    """
+    Indicators of the sensors of each source or district: exceedance hours
+    per sensor and energy averaged levels.
+    """
+    levels = [f"L{period}" for period in PERIODS] + ["Lden"]
+    over = [f"over_{threshold}" for threshold in THRESHOLDS]
+
+    energy = 10 ** (indicators[levels].astype("float64") / 10)
+    grouped = indicators.groupby(by, observed=True)
+    df = grouped[over].mean().join(grouped.size().rename("sensors"))
+    df[levels] = 10 * np.log10(energy.groupby(indicators[by], observed=True).mean())
+    return df.reset_index()
+
+
+# --- ANOMALIES ---
+
+
+def rolling_zscores(
+    levels: np.ndarray, window: int = WINDOW, history: np.ndarray = None
+) -> np.ndarray:
+    """
+    Z-score of each hour against the `window` previous hours of its sensor,
+    from cumulative sums along the hours. `history` holds the last hours of
+    the previous block, so a new block is scored without the past ones.
+    """
+    n_history = 0 if history is None else history.shape[1]
+    if history is not None:
+        levels = np.concatenate([history, levels], axis=1)
+
+    measured = ~np.isnan(levels)
+    values = np.where(measured, levels, 0).astype("float64")
+
+    def window_sums(array: np.ndarray) -> np.ndarray:
+        cumulative = np.zeros((array.shape[0], array.shape[1] + 1))
+        np.cumsum(array, axis=1, out=cumulative[:, 1:])
+        ends = np.arange(array.shape[1])
+        return cumulative[:, ends] - cumulative[:, np.maximum(ends - window, 0)]
+
+    counts = window_sums(measured)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = window_sums(values) / counts
+        stds = np.sqrt(np.maximum(window_sums(values**2) / counts - means**2, 0))
+        zscores = (levels - means) / stds
+    zscores[(counts < MIN_WINDOW_HOURS) | (stds == 0)] = np.nan
+    return zscores[:, n_history:]
+
+
+def noise_events(
+    levels: np.ndarray,
+    hours: pd.DatetimeIndex,
+    sensors: pd.DataFrame,
+    history: np.ndarray = None,
+) -> pd.DataFrame:
+    """
+    Anomaly events: runs of consecutive hours of a sensor whose z-score
+    exceeds Z_THRESHOLD.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per event with its sensor, source, district, start, duration
+        in hours, peak level and peak z-score.
+    """
+    zscores = rolling_zscores(levels, history=history)
+
+    # A padding column keeps the runs from spanning two sensors
+    n_sensors, n_hours = levels.shape
+    anomalous = np.zeros((n_sensors, n_hours + 1), dtype="int8")
+    anomalous[:, :-1] = np.nan_to_num(zscores) >= Z_THRESHOLD
+    changes = np.diff(anomalous.ravel(), prepend=0)
+    starts = np.flatnonzero(changes == 1)
+    ends = np.flatnonzero(changes == -1)
+
+    bounds = np.ravel([starts, ends], order="F")
+    padded = np.full((n_sensors, n_hours + 1), -np.inf)
+    padded[:, :-1] = np.nan_to_num(levels, nan=-np.inf)
+    peak_levels = np.maximum.reduceat(padded.ravel(), bounds)[::2]
+    padded[:, :-1] = np.nan_to_num(zscores, nan=-np.inf)
+    peak_zscores = np.maximum.reduceat(padded.ravel(), bounds)[::2]
+
+    rows = starts // (n_hours + 1)
+    return (
+        sensors[["id", "source", "district_name"]]
+        .iloc[rows]
+        .reset_index(drop=True)
+        .assign(
+            start=hours[starts % (n_hours + 1)],
+            hours=(ends - starts).astype("int32"),
+            peak_level=peak_levels.astype("float32"),
+            peak_zscore=peak_zscores.astype("float32"),
+        )
+    )
+
+
+# --- CACHED RESULTS ---
+
+
+def _analytics(
+    accumulators: dict, sensors: pd.DataFrame, events: pd.DataFrame, history: np.ndarray
+) -> dict:
+    indicators = noise_indicators(accumulators, sensors)
+    return {
+        "sensors": indicators,
+        "sources": group_indicators(indicators, "source"),
+        "districts": group_indicators(indicators, "district_name"),
+        "events": events,
+        # State for update_noise_analytics
+        "accumulators": accumulators,
+        "history": history,
+    }
+
+
+def build_noise_analytics() -> dict:
+    array = get_noise_array()
+    levels, hours, sensors = array["levels"], array["hours"], array["sensors"]
+    return _analytics(
+        noise_accumulators(levels, hours),
+        sensors,
+        noise_events(levels, hours, sensors),
+        levels[:, -WINDOW:],
+    )
+
+
+def update_noise_analytics(
+    analytics: dict, levels: np.ndarray, hours: pd.DatetimeIndex
+) -> dict:
+    """
+    Analytics including a new block of hours, with the sensors of the
+    previous ones as rows. Only the new hours are scanned: the indicators
+    come from the merged accumulators and the events are scored against the
+    last WINDOW hours kept in the analytics.
+    """
+    sensors = analytics["sensors"][SENSOR_COLUMNS]
+    if levels.shape[0] != len(sensors):
+        raise ValueError(f"{levels.shape[0]} sensors not in available {len(sensors)}")
+
+    events = noise_events(levels, hours, sensors, history=analytics["history"])
+    return _analytics(
+        merge_accumulators(analytics["accumulators"], noise_accumulators(levels, hours)),
+        sensors,
+        pd.concat([analytics["events"], events], ignore_index=True),
+        np.concatenate([analytics["history"], levels], axis=1)[:, -WINDOW:],
+    )
+
+
+@lru_cache(maxsize=1)
+def get_noise_analytics() -> dict:
+    """
+    Exceedances, Lden indicators per sensor, source and district, and the
+    anomaly events of the year, cached in a pickle.
+    """
+    return load_or_build("noise_analytics", build_noise_analytics, [NOISE_FILE])
@@ -0,0 +1,136 @@
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from data.cache import load_or_build
+from data.socio_economic import POPULATION_FILES, read_counts
+
+# Barri codes run from 1 to 73, ages from 0 to 100 (100 and over)
+N_BARRIS = 73
+N_AGES = 101
+SEXES = ["Homme", "Femme"]
+
+SENIOR_AGE = 65
+
+DELTAS = {
+    "growth": "Croissance de la population [%]",
+    "aging": "Évolution de l'âge moyen [années]",
+    "gender_shift": "Évolution de la part de femmes [points]",
+    "senior_shift": "Évolution de la part des 65 ans et plus [points]",
+}
+
+# --- COUNTS ---
+
+
+def population_counts(year: int) -> np.ndarray:
+    """
+    Residents of a year in a dense int32 array indexed by (barri, sex, age),
+    filled with one bincount over the flat integer codes of the rows.
+    """
+    if year not in POPULATION_FILES:
+        raise ValueError(f"year {year} not in available years.")
+
+    df = read_counts(POPULATION_FILES[year], ["SEXE", "EDAT_1"])
+    codes = (
+        (df["Codi_Barri"].to_numpy(dtype="int64") - 1) * len(SEXES)
+        + (df["SEXE"].to_numpy() - 1)
+    ) * N_AGES + np.minimum(df["EDAT_1"].to_numpy(), N_AGES - 1)
+
+    counts = np.bincount(
+        codes, weights=df["Valor"].to_numpy(), minlength=N_BARRIS * len(SEXES) * N_AGES
+    )
+    return counts.astype("int32").reshape(N_BARRIS, len(SEXES), N_AGES)
+
+
+@lru_cache(maxsize=None)
+def get_population_counts(year: int) -> np.ndarray:
+    if year not in POPULATION_FILES:
+        raise ValueError(f"year {year} not in available years.")
+
+    return load_or_build(
+        f"population_{year}",
+        lambda: population_counts(year),
+        [POPULATION_FILES[year]],
+    )
+
+
+def get_population_store() -> tuple[list[int], np.ndarray]:
+    """
+    All the available years stacked in one (year, barri, sex, age) array.
+    Each year is parsed once and cached on its own, so a new year only adds
+    its own file to parse.
+    """
+    years = sorted(POPULATION_FILES)
+    return years, np.stack([get_population_counts(year) for year in years])
+
+
+# --- DELTAS ---
+
+
+def population_indicators(counts: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Population, mean age, share of women and share of seniors of each barri,
+    for counts indexed by (..., barri, sex, age).
+    """
+    ages = np.arange(N_AGES)
+    by_age = counts.sum(axis=-2)
+    population = by_age.sum(axis=-1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "population": population,
+            "mean_age": (by_age * ages).sum(axis=-1) / population,
+            "women_share": counts[..., 1, :].sum(axis=-1) / population * 100,
+            "senior_share": by_age[..., SENIOR_AGE:].sum(axis=-1) / population * 100,
+        }
+
+
+def population_delta(year_from: int, year_to: int) -> pd.DataFrame:
+    """
+    Change of the population indicators of each barri between two years.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per barri code with the DELTAS.
+    """
+    before = population_indicators(get_population_counts(year_from))
+    after = population_indicators(get_population_counts(year_to))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growth = (after["population"] / before["population"] - 1) * 100
+
+    return pd.DataFrame(
+        {
+            "growth": growth,
+            "aging": after["mean_age"] - before["mean_age"],
+            "gender_shift": after["women_share"] - before["women_share"],
+            "senior_shift": after["senior_share"] - before["senior_share"],
+        },
+        index=pd.RangeIndex(1, N_BARRIS + 1, name="Codi_Barri"),
+    ).astype("float32")
+
+
+@lru_cache(maxsize=None)
+def get_population_delta(year_from: int, year_to: int) -> pd.DataFrame:
+    """Deltas between a pair of years, cached in a parquet file per pair."""
+    for year in (year_from, year_to):
+        if year not in POPULATION_FILES:
+            raise ValueError(f"year {year} not in available years.")
+
+    return load_or_build(
+        f"population_delta_{year_from}_{year_to}",
+        lambda: population_delta(year_from, year_to),
+        [POPULATION_FILES[year_from], POPULATION_FILES[year_to]],
+        extension="parquet",
+    )
+
+
+def get_all_population_deltas() -> dict[tuple[int, int], pd.DataFrame]:
+    """Deltas of every pair of available years, only the missing pairs being computed."""
+    return {
+        (year_from, year_to): get_population_delta(year_from, year_to)
+        for year_from, year_to in combinations(sorted(POPULATION_FILES), 2)
+    }
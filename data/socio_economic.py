@@ -0,0 +1,252 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from data.cache import load_or_build
+
+DATA_PATH = "./data/"
+
+POPULATION_FILES = {
+    2021: DATA_PATH + "pred/2021_pad_mdba_sexe_edat-1.csv",
+    2024: DATA_PATH + "pred/2024_pad_mdba_sexe_edat-1.csv",
+}
+INCOME_FILE = DATA_PATH + "pred/2021_renda_disponible_llars_per_persona.csv"
+HOUSEHOLD_FILE = DATA_PATH + "pred/2021_pad_dom_mdbas_n-persones.csv"
+SURFACE_FILE = DATA_PATH + "pred/2021_superficie.csv"
+
+# Counts below 5 are published as ".." and replaced by 2 (arbitrary)
+CENSORED_VALUE = 2
+
+# Numbers of clusters of the elbow curve
+K_RANGE = range(1, 11)
+
+FEATURES = [
+    "Age_Mean",
+    "Gender_Proportion",
+    "Income_Mean",
+    "N_People_per_Household",
+    "Pop_Density",
+]
+
+# --- FEATURES ---
+
+
+def read_counts(path: str, columns: list[str]) -> pd.DataFrame:
+    """Read a census count file, the censored counts being parsed as missing."""
+    df = pd.read_csv(
+        path,
+        usecols=["Codi_Barri", "Valor", *columns],
+        na_values={"Valor": [".."]},
+        dtype={"Codi_Barri": "int8"},
+    )
+    df["Valor"] = df["Valor"].fillna(CENSORED_VALUE).astype("int32")
+    return df
+
+
+def weighted_means(
+    df: pd.DataFrame, by: str, weight: str, columns: dict[str, str]
+) -> pd.DataFrame:
+    """
+    Weighted means of several columns in a single grouped pass, as the sum of
+    w·x over the sum of w.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The rows to aggregate.
+    by : str
+        The grouping column.
+    weight : str
+        The weight column.
+    columns : dict[str, str]
+        The columns to average, mapped to the names of the means.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per group with the means and the sum of the weights under
+        the name of the weight column.
+    """
+    weights = df[weight].to_numpy(dtype="float64")
+    products = pd.DataFrame(
+        df[list(columns)].to_numpy(dtype="float64") * weights[:, None],
+        columns=list(columns.values()),
+    )
+    products[weight] = weights
+
+    sums = products.groupby(df[by].to_numpy()).sum()
+    sums[list(columns.values())] = sums[list(columns.values())].div(
+        sums[weight], axis="index"
+    )
+    return sums.rename_axis(by)
+
+
+def socio_economic_features(year: int) -> pd.DataFrame:
+    """
+    Feature matrix of the barris for one year of the population register.
+
+    Only the population register exists for every year, so the income,
+    household and surface statistics of 2021 are used for all years.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per barri with its code, name and the FEATURES as float32.
+    """
+    if year not in POPULATION_FILES:
+        raise ValueError(f"year {year} not in available years.")
+
+    df_pop = read_counts(POPULATION_FILES[year], ["Nom_Barri", "SEXE", "EDAT_1"])
+    df_pop["SEXE"] -= 1
+    population = weighted_means(
+        df_pop,
+        "Codi_Barri",
+        "Valor",
+        {"EDAT_1": "Age_Mean", "SEXE": "Gender_Proportion"},
+    )
+
+    households = weighted_means(
+        read_counts(HOUSEHOLD_FILE, ["N_PERSONES_AGG"]),
+        "Codi_Barri",
+        "Valor",
+        {"N_PERSONES_AGG": "N_People_per_Household"},
+    )
+
+    df_income = pd.read_csv(INCOME_FILE, usecols=["Codi_Barri", "Import_Euros"])
+    df_surface = pd.read_csv(SURFACE_FILE, usecols=["Codi_Barri", "Superfície (ha)"])
+
+    df = pd.concat(
+        [
+            df_pop.groupby("Codi_Barri")["Nom_Barri"].first(),
+            population,
+            df_income.groupby("Codi_Barri")["Import_Euros"].mean().rename("Income_Mean"),
+            households["N_People_per_Household"],
+            df_surface.set_index("Codi_Barri")["Superfície (ha)"],
+        ],
+        axis="columns",
+        join="inner",
+    )
+    df["Pop_Density"] = df["Valor"] / df["Superfície (ha)"]
+
+    return (
+        df[["Nom_Barri", *FEATURES]]
+        .astype({feature: "float32" for feature in FEATURES})
+        .reset_index()
+    )
+
+
+@lru_cache(maxsize=None)
+def get_socio_economic_features(year: int = 2021) -> pd.DataFrame:
+    """Barri feature matrix of a year, cached in a parquet file."""
+    if year not in POPULATION_FILES:
+        raise ValueError(f"year {year} not in available years.")
+
+    return load_or_build(
+        f"socio_economic_{year}",
+        lambda: socio_economic_features(year),
+        [POPULATION_FILES[year], INCOME_FILE, HOUSEHOLD_FILE, SURFACE_FILE],
+        extension="parquet",
+    )
+
+
+# --- PCA AND CLUSTERING ---
+
+
+def _check_features(features: tuple[str, ...]) -> None:
+    unknown = set(features) - set(FEATURES)
+    if unknown:
+        raise ValueError(f"features {sorted(unknown)} not in available features.")
+    if len(features) < 2:
+        raise ValueError("at least 2 features are needed for the PCA.")
+
+
+@lru_cache(maxsize=64)
+def get_pca(year: int, features: tuple[str, ...] = tuple(FEATURES)) -> dict:
+    """
+    Two component PCA of the standardized features, cached per year and
+    feature subset.
+
+    Parameters
+    ----------
+    year : int
+        Year of the population register.
+    features : tuple[str, ...]
+        Subset of FEATURES, at least two of them.
+
+    Returns
+    -------
+    dict
+        "pca" the fitted PCA, "projection" the barri codes, names and their
+        "PC1" and "PC2" coordinates, and "loadings" the correlations between
+        each feature and the two components.
+    """
+    from sklearn.decomposition import PCA
+
+    _check_features(features)
+    df = get_socio_economic_features(year)
+
+    # Standardize the data
+    X = df[list(features)].to_numpy(dtype="float64")
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+
+    pca = PCA(n_components=2)
+    projection = pca.fit_transform(X)
+
+    # Correlation of the standardized features with the components
+    loadings = pca.components_.T * np.sqrt(pca.explained_variance_ * (len(X) - 1) / len(X))
+
+    return {
+        "pca": pca,
+        "projection": df[["Codi_Barri", "Nom_Barri"]].assign(
+            PC1=projection[:, 0], PC2=projection[:, 1]
+        ),
+        "loadings": pd.DataFrame(loadings, index=list(features), columns=["PC1", "PC2"]),
+    }
+
+
+def _fit_kmeans(X: np.ndarray, k: int, n_init: int):
+    from sklearn.cluster import KMeans
+
+    return KMeans(n_clusters=k, n_init=n_init, random_state=0).fit(X)
+
+
+@lru_cache(maxsize=64)
+def get_clusters(
+    year: int, features: tuple[str, ...] = tuple(FEATURES), n_init: int = 10
+) -> dict:
+    """
+    KMeans of the PCA projection for every k of the elbow curve, fitted once
+    in parallel. Picking another number of clusters afterwards is a lookup.
+
+    Returns
+    -------
+    dict
+        "inertia" the elbow curve over K_RANGE and "labels" the cluster of
+        each barri for every k.
+    """
+    from joblib import Parallel, delayed
+
+    X = get_pca(year, features)["projection"][["PC1", "PC2"]].to_numpy()
+    fits = Parallel(n_jobs=-1, prefer="threads")(
+        delayed(_fit_kmeans)(X, k, n_init) for k in K_RANGE
+    )
+    return {
+        "inertia": [fit.inertia_ for fit in fits],
+        "labels": {k: fit.labels_ for k, fit in zip(K_RANGE, fits)},
+    }
+
+
+@lru_cache(maxsize=None)
+def get_socio_economic_analysis(year: int = 2021) -> dict:
+    """PCA, elbow inertias and the 4 clusters of the barris on all the features."""
+    pca = get_pca(year)
+    clusters = get_clusters(year)
+    return {
+        "features": get_socio_economic_features(year),
+        "pca": pca["pca"],
+        "pca_df": pca["projection"][["PC1", "PC2"]].assign(
+            Cluster=clusters["labels"][4]
+        ),
+        "inertia": clusters["inertia"],
+    }
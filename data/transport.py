@@ -0,0 +1,158 @@
+from functools import lru_cache
+
+import pandas as pd
+
+from data.cache import load_or_build
+from data.geometry import DISTRICT_FILE, get_zones
+
+DATA_PATH = "./data/"
+
+AGE_FILE = DATA_PATH + "age_of_vehicle/2023/2023_Antiguitat_tipus_vehicle.csv"
+AGE_PIE_FILE = DATA_PATH + "age_of_vehicle/2023/2023_Antiguitat_tipus_vehicle2.csv"
+TYPE_FILE = DATA_PATH + "type_of_vehicle/2023/2023_Parc_vehicles_tipus_propulsio.csv"
+TYPE_PIE_FILE = DATA_PATH + "type_of_vehicle/2023/2023_Parc_vehicles_tipus_propulsio2.csv"
+POPULATION_FILE = DATA_PATH + "population/2023/2023_pad_mdbas.csv"
+SURFACE_FILE = DATA_PATH + "superficie/2021_superficie.csv"
+
+# Labels as they are stored in the source files
+OLD_VEHICLES = "MÃ©s de 20 anys"
+GREEN_VEHICLES = ["Elèctrica", "Híbrid"]
+
+KMEANS_FEATURES = ["Age_Percentage", "Green_Percentage", "Vehicles_Per_100"]
+
+# --- VEHICLES ---
+
+
+def read_per_district(path: str, columns: list[str]) -> pd.DataFrame:
+    """Read a statistics file keeping the rows attributed to a district."""
+    df = pd.read_csv(path, usecols=["Codi_Districte", *columns])
+    df["Codi_Districte"] = pd.to_numeric(df["Codi_Districte"], errors="coerce")
+    return df.dropna(subset="Codi_Districte").astype({"Codi_Districte": "int8"})
+
+
+def transport_metrics() -> pd.DataFrame:
+    """
+    All the district metrics of the transport page, one grouped pass per file.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per district with vehicle counts, the share of vehicles older
+        than 20 years, the share of green vehicles, the number of vehicles per
+        100 residents and the KMeans cluster of the district.
+    """
+    from sklearn.cluster import KMeans
+
+    df_age = read_per_district(AGE_FILE, ["Antiguitat", "Nombre"])
+    df_age = (
+        df_age.assign(
+            Vehicles_20_Any=df_age["Nombre"].where(df_age["Antiguitat"] == OLD_VEHICLES, 0)
+        )
+        .groupby("Codi_Districte")[["Nombre", "Vehicles_20_Any"]]
+        .sum()
+        .rename(columns={"Nombre": "Total_Vehicles"})
+    )
+
+    df_type = read_per_district(TYPE_FILE, ["Tipus_Propulsio", "Nombre"])
+    df_type = (
+        df_type.assign(
+            Green_Vehicles=df_type["Nombre"].where(
+                df_type["Tipus_Propulsio"].isin(GREEN_VEHICLES), 0
+            )
+        )
+        .groupby("Codi_Districte")[["Nombre", "Green_Vehicles"]]
+        .sum()
+        .rename(columns={"Nombre": "Registered_Vehicles"})
+    )
+
+    df_pop = (
+        read_per_district(POPULATION_FILE, ["Valor"])
+        .groupby("Codi_Districte")["Valor"]
+        .sum()
+        .rename("Population")
+    )
+
+    df = (
+        get_zones("district")[["code", "name"]]
+        .set_axis(["district_code", "Nom_Districte"], axis="columns")
+        .set_index("district_code", drop=False)
+        .join(df_age)
+        .join(df_type)
+        .join(df_pop)
+    )
+    df["Age_Percentage"] = (df["Vehicles_20_Any"] / df["Total_Vehicles"] * 100).round(2)
+    df["Green_Percentage"] = (
+        df["Green_Vehicles"] / df["Registered_Vehicles"] * 100
+    ).round(2)
+    df["Vehicles_Per_100"] = (
+        df["Registered_Vehicles"] / df["Population"] * 100
+    ).round(2)
+
+    df["Cluster"] = (
+        KMeans(n_clusters=3, random_state=42).fit(df[KMEANS_FEATURES]).labels_
+    )
+
+    return df.reset_index(drop=True)
+
+
+def transport_pies() -> dict[str, pd.DataFrame]:
+    df_age = pd.read_csv(AGE_PIE_FILE, usecols=["Antiguitat", "Nombre"])
+    df_type = pd.read_csv(TYPE_PIE_FILE, usecols=["Tipus_Propulsio", "Nombre"])
+    return {
+        "age": df_age.groupby("Antiguitat", as_index=False, sort=False).sum(),
+        "type": df_type.groupby("Tipus_Propulsio", as_index=False, sort=False).sum(),
+    }
+
+
+def transport_population_surface() -> pd.DataFrame:
+    df_pop = read_per_district(POPULATION_FILE, ["Valor"])
+    df_surface = read_per_district(SURFACE_FILE, ["SuperfÃ­cie (ha)"]).rename(
+        columns={"SuperfÃ­cie (ha)": "Superficie (ha)"}
+    )
+
+    return (
+        get_zones("district")[["code", "name"]]
+        .set_axis(["Codi_Districte", "Nom_Districte"], axis="columns")
+        .set_index("Codi_Districte")
+        .join(df_pop.groupby("Codi_Districte")["Valor"].sum())
+        .join(df_surface.groupby("Codi_Districte")["Superficie (ha)"].sum())
+        .reset_index(drop=True)
+    )
+
+
+def load_transport_data() -> dict:
+    df = transport_metrics()
+    return {
+        "districts": df,
+        "pies": transport_pies(),
+        "population_surface": transport_population_surface(),
+        "totals": {
+            "pourcentage_vehicules_20_ans": df["Vehicles_20_Any"].sum()
+            / df["Total_Vehicles"].sum()
+            * 100,
+            "pourcentage_vehicules_verts": df["Green_Vehicles"].sum()
+            / df["Registered_Vehicles"].sum()
+            * 100,
+            "nombre_vehicules_par_100_habitants": df["Registered_Vehicles"].sum()
+            / df["Population"].sum()
+            * 100,
+        },
+    }
+
+
+@lru_cache(maxsize=1)
+def get_transport_data() -> dict:
+    """Transport metrics, computed on first use and cached as a derived artifact."""
+    return load_or_build(
+        "transport",
+        load_transport_data,
+        [
+            AGE_FILE,
+            AGE_PIE_FILE,
+            TYPE_FILE,
+            TYPE_PIE_FILE,
+            POPULATION_FILE,
+            SURFACE_FILE,
+            DISTRICT_FILE,
+        ],
+    )
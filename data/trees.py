@@ -0,0 +1,183 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from data.cache import load_or_build
+from data.geometry import ZONE_FILES, get_zones
+
+DATA_PATH = "./data/"
+
+TREE_FILES = {
+    "street": DATA_PATH + "trees/street_trees/2023_4T_OD_Arbrat_Viari_BCN.csv",
+    "zone": DATA_PATH + "trees/zone_trees/2023_4T_OD_Arbrat_Zona_BCN.csv",
+    "park": DATA_PATH + "trees/park_trees/2023_4T_OD_Arbrat_Parcs_BCN.csv",
+}
+
+TREE_COLUMNS = {
+    "x_etrs89": "float32",
+    "y_etrs89": "float32",
+    "nom_cientific": "string",
+    "codi_barri": "Int8",
+    "codi_districte": "Int8",
+}
+
+# Kernel density surface: pixel size and gaussian bandwidth in meters
+KDE_PIXEL = 50
+KDE_BANDWIDTH = 200
+
+# --- INVENTORY ---
+
+
+def read_tree_inventory(inventory: str, chunksize: int = 100_000) -> pd.DataFrame:
+    """
+    Stream one tree inventory file with only the columns used downstream.
+
+    Parameters
+    ----------
+    inventory : str
+        "street", "zone" or "park".
+    chunksize : int, optional
+        Number of rows parsed at once, by default 100 000.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per tree with its EPSG:25831 coordinates, species, barri and district.
+    """
+    if inventory not in TREE_FILES:
+        raise ValueError(f"inventory {inventory} not in available inventories.")
+
+    chunks = pd.read_csv(
+        TREE_FILES[inventory],
+        usecols=list(TREE_COLUMNS),
+        dtype=TREE_COLUMNS,
+        chunksize=chunksize,
+    )
+    df = pd.concat(chunks, ignore_index=True)
+
+    return df.rename(
+        columns={
+            "x_etrs89": "x",
+            "y_etrs89": "y",
+            "nom_cientific": "species",
+            "codi_barri": "area_code",
+            "codi_districte": "district_code",
+        }
+    ).astype({"species": "category"})
+
+
+def load_tree_data() -> pd.DataFrame:
+    df = pd.concat(
+        [
+            read_tree_inventory(inventory).assign(inventory=inventory)
+            for inventory in TREE_FILES
+        ],
+        ignore_index=True,
+    )
+    return df.astype(
+        {
+            "species": "category",
+            "inventory": pd.CategoricalDtype(list(TREE_FILES)),
+        }
+    )
+
+
+@lru_cache(maxsize=1)
+def get_tree_data() -> pd.DataFrame:
+    return load_or_build("trees_inventory", load_tree_data, TREE_FILES.values())
+
+
+# --- ROLLUPS ---
+
+
+def tree_rollup(df: pd.DataFrame, level: str) -> gpd.GeoDataFrame:
+    """
+    Number of trees per inventory and density per km² for each district or barri,
+    areas being computed from the zone geometries.
+    """
+    zones = get_zones(level, "EPSG:25831")
+    code = "district_code" if level == "district" else "area_code"
+
+    counts = (
+        df.groupby([code, "inventory"], observed=False)
+        .size()
+        .unstack("inventory", fill_value=0)
+    )
+    counts["trees"] = counts.sum(axis="columns")
+
+    gdf = zones.merge(counts, left_on="code", right_index=True, how="left")
+    gdf[counts.columns] = gdf[counts.columns].fillna(0).astype("int32")
+    gdf["area_km2"] = gdf.area / 1e6
+    gdf["trees_per_km2"] = gdf["trees"] / gdf["area_km2"]
+
+    return gdf.to_crs(epsg=4326)
+
+
+@lru_cache(maxsize=None)
+def get_tree_rollup(level: str) -> gpd.GeoDataFrame:
+    return load_or_build(
+        f"trees_{level}",
+        lambda: tree_rollup(get_tree_data(), level),
+        [*TREE_FILES.values(), ZONE_FILES[level]],
+    )
+
+
+# --- DENSITY SURFACE ---
+
+
+def _gaussian_matrix(centers: np.ndarray, bandwidth: float) -> np.ndarray:
+    distances = centers[:, None] - centers[None, :]
+    return np.exp(-0.5 * (distances / bandwidth) ** 2)
+
+
+def kernel_density(
+    x: np.ndarray,
+    y: np.ndarray,
+    bounds: tuple[float, float, float, float],
+    pixel: float = KDE_PIXEL,
+    bandwidth: float = KDE_BANDWIDTH,
+) -> dict:
+    """
+    Gaussian kernel density of points on a regular raster, in points per km².
+    Points are first binned on the raster then smoothed with the separable
+    kernel as two matrix products, so the cost does not depend on the number
+    of points.
+
+    Returns
+    -------
+    dict
+        "x" and "y" pixel centers in EPSG:25831 and the "density" raster,
+        rows along y and columns along x.
+    """
+    minx, miny, maxx, maxy = bounds
+    x_edges = np.arange(minx, maxx + pixel, pixel)
+    y_edges = np.arange(miny, maxy + pixel, pixel)
+    counts, _, _ = np.histogram2d(y, x, bins=[y_edges, x_edges])
+
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    density = (
+        _gaussian_matrix(y_centers, bandwidth)
+        @ counts
+        @ _gaussian_matrix(x_centers, bandwidth).T
+    ) / (2 * np.pi * bandwidth**2)
+
+    return {
+        "x": x_centers,
+        "y": y_centers,
+        "density": (density * 1e6).astype("float32"),
+    }
+
+
+@lru_cache(maxsize=1)
+def get_tree_density_raster() -> dict:
+    def build() -> dict:
+        df = get_tree_data()
+        bounds = get_zones("district", "EPSG:25831").total_bounds
+        return kernel_density(df["x"].values, df["y"].values, bounds)
+
+    return load_or_build(
+        "trees_kde", build, [*TREE_FILES.values(), ZONE_FILES["district"]]
+    )
@@ -0,0 +1,133 @@
+from functools import lru_cache
+from itertools import islice
+from typing import Iterator
+
+import fiona
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from data.cache import load_or_build
+from data.geometry import ZONE_FILES, get_zones
+from data.grid import build_grid
+
+DATA_PATH = "./data/"
+
+VEGETATION_FILE = DATA_PATH + "trees/no_vegetation/2017_vegetacio.gpkg"
+VEGETATION_LAYER = "2017_vegetacio"
+VEGETATION_CRS = "EPSG:25831"
+CHUNK_SIZE = 250
+
+# --- READING ---
+
+
+def read_vegetation_chunks(
+    bbox: tuple[float, float, float, float] = None, chunksize: int = CHUNK_SIZE
+) -> Iterator[gpd.GeoDataFrame]:
+    """
+    Stream the 2017 vegetation GeoPackage by chunks of polygons, keeping only
+    the polygons intersecting bbox and the vegetation attribute.
+
+    Parameters
+    ----------
+    bbox : tuple[float, float, float, float], optional
+        Bounding box in EPSG:25831, by default the whole layer.
+    chunksize : int, optional
+        Number of polygons per chunk, by default 250.
+
+    Yields
+    ------
+    gpd.GeoDataFrame
+        Polygons with their standardized vegetation share ("vegetation").
+    """
+    with fiona.open(
+        VEGETATION_FILE, layer=VEGETATION_LAYER, include_fields=["PercNDVINo"]
+    ) as source:
+        features = source.filter(bbox=bbox)
+        while chunk := list(islice(features, chunksize)):
+            yield gpd.GeoDataFrame.from_features(chunk, crs=VEGETATION_CRS).rename(
+                columns={"PercNDVINo": "vegetation"}
+            ).astype({"vegetation": "float32"})
+
+
+# --- OVERLAY ---
+
+
+def overlay_vegetation(
+    zones: gpd.GeoDataFrame, chunksize: int = CHUNK_SIZE
+) -> pd.DataFrame:
+    """
+    Area-weighted vegetation of each zone. Every chunk of vegetation polygons
+    is indexed in an STRtree, the zones are queried against it and all the
+    intersections are computed in one vectorized call, so only one chunk is
+    held in memory at a time.
+
+    The layer stores a standardized vegetation share (mean 0, standard
+    deviation 1 over the census sections), the score rescales its area-weighted
+    mean between 0 and 1 like the other life quality scores.
+
+    Returns
+    -------
+    pd.DataFrame
+        "covered_km2", "vegetation_index" and "vegetation_score" per zone,
+        with the index of zones.
+    """
+    geometries = np.asarray(zones.geometry.to_crs(VEGETATION_CRS).values)
+    covered = np.zeros(len(zones))
+    weighted = np.zeros(len(zones))
+
+    bbox = tuple(shapely.total_bounds(geometries))
+    for chunk in read_vegetation_chunks(bbox, chunksize):
+        polygons = np.asarray(chunk.geometry.values)
+        zone_index, polygon_index = shapely.STRtree(polygons).query(
+            geometries, predicate="intersects"
+        )
+        areas = shapely.area(
+            shapely.intersection(geometries[zone_index], polygons[polygon_index])
+        )
+
+        covered += np.bincount(zone_index, areas, minlength=len(zones))
+        weighted += np.bincount(
+            zone_index,
+            areas * chunk["vegetation"].values[polygon_index],
+            minlength=len(zones),
+        )
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        index = np.where(covered > 0, weighted / covered, np.nan)
+
+    df = pd.DataFrame(
+        {"covered_km2": covered / 1e6, "vegetation_index": index}, index=zones.index
+    )
+    df["vegetation_score"] = (df["vegetation_index"] - df["vegetation_index"].min()) / (
+        df["vegetation_index"].max() - df["vegetation_index"].min()
+    )
+    return df
+
+
+@lru_cache(maxsize=None)
+def get_vegetation_rollup(level: str) -> pd.DataFrame:
+    """Vegetation per "district" or "barri", cached in a parquet file."""
+
+    def build() -> pd.DataFrame:
+        zones = get_zones(level, VEGETATION_CRS)
+        return zones[["code", "name"]].join(overlay_vegetation(zones))
+
+    return load_or_build(
+        f"vegetation_{level}",
+        build,
+        [VEGETATION_FILE, ZONE_FILES[level]],
+        extension="parquet",
+    )
+
+
+@lru_cache(maxsize=None)
+def get_vegetation_grid(resolution: int, kind: str = "hex") -> pd.DataFrame:
+    """Vegetation per grid cell, cached in a parquet file."""
+    return load_or_build(
+        f"vegetation_grid_{kind}_{resolution}",
+        lambda: overlay_vegetation(build_grid(resolution, kind)[1]),
+        [VEGETATION_FILE, ZONE_FILES["district"]],
+        extension="parquet",
+    )
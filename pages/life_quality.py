@@ -1,7 +1,38 @@
-from dash import register_page, Output, Input, State, dcc, callback, html
+import os
+
+from dash import (
+    register_page,
+    get_relative_path,
+    Output,
+    Input,
+    State,
+    dcc,
+    callback,
+    ctx,
+    html,
+    no_update,
+)
 import dash_mantine_components as dmc
 
+from data.access import fetch
 from data.load_and_process_data import gdf_air, gdf_noise, df_life_quality
+from data.grid import (
+    GRID_METRICS,
+    get_grid_layers,
+    get_grid_layers_for_zoom,
+    resolution_for_zoom,
+)
+from data.meteo import METEO_VARIABLES, get_noise_weather
+from data.noise import (
+    get_noise_analytics,
+    get_noise_heatmap_cube,
+    get_noise_level_summary,
+    get_noise_sensor_counts,
+    get_noise_sensors,
+    noise_heatmap,
+    noise_heatmap_districts,
+)
+from data.trees import get_tree_density_raster, get_tree_rollup
 from view.life_quality import (
     histo_air_rang,
     line_noise_level,
@@ -9,10 +40,22 @@ from view.life_quality import (
     noise_distribution,
     map_noise_sensors,
     corrplot_score,
+    map_trees_density,
+    map_trees_surface,
+    scatter_noise_weather,
+    bar_noise_exceedance,
+    scatter_noise_events,
+    heatmap_noise_calendar,
+    map_grid,
 )
+from view.encoding import encode_figure
+from view.maps import ASSETS_PATH, render_asset
 
 register_page(__name__, path="/life_quality", name="Qualité de vie", title="OPENDATA")
 
+# Initial zoom of the grid map
+GRID_ZOOM = 11
+
 def layout():
     return dmc.Stack(
         [
@@ -20,6 +63,7 @@ def layout():
             air_quality_layout(),
             trees_quantity_layout(),
             hospitals_layout(),
+            grid_layout(),
             life_quality_layout(),
         ]
     )
@@ -84,7 +128,7 @@ def generate_noise_sensors_figures():
                                 ),
                                 dcc.Graph(
                                     id={"type": "graph", "index": "noise_distribution"},
-                                    figure=noise_distribution(gdf_noise, False),
+                                    figure=noise_distribution(get_noise_sensor_counts(), False),
                                 ),
                             ]
                         ),
@@ -101,7 +145,7 @@ def generate_noise_sensors_figures():
                                 ),
                                 dcc.Graph(
                                     id={"type": "graph", "index": "map_noise_sensors"},
-                                    figure=map_noise_sensors(gdf_noise),
+                                    figure=map_noise_sensors(get_noise_sensors()),
                                 ),
                             ]
                         ),
@@ -121,7 +165,7 @@ def generate_noise_figures():
         [
             dcc.Graph(
                 id={"type": "graph", "index": "line_noise_level"},
-                figure=line_noise_level(gdf_noise),
+                figure=encode_figure(line_noise_level(gdf_noise)),
             ),
             dmc.Text(
                 [
@@ -134,6 +178,33 @@ def generate_noise_figures():
                     ", un événement caractérisé par des célébrations bruyantes, notamment des feux d’artifice et des rassemblements festifs. Cette tendance met en évidence l’influence des rythmes urbains et des événements ponctuels sur l’environnement sonore de la ville.",
                 ]
             ),
+            dmc.Text(
+                "La carte calendaire détaille le niveau moyen de chaque heure de l’année : les nuits plus calmes, les week-ends et les périodes de fête se lisent directement selon le type de bruit et le district choisis."
+            ),
+            dmc.Group(
+                [
+                    dmc.Select(
+                        label="Type de bruit",
+                        id="select-noise-heatmap-source",
+                        data=["TOUS"] + get_noise_heatmap_cube()["sources"],
+                        value="TOUS",
+                        allowDeselect=False,
+                        w=300,
+                    ),
+                    dmc.Select(
+                        label="District",
+                        id="select-noise-heatmap-district",
+                        data=["TOUS"] + noise_heatmap_districts("TOUS"),
+                        value="TOUS",
+                        allowDeselect=False,
+                        w=300,
+                    ),
+                ]
+            ),
+            dcc.Graph(
+                id={"type": "graph", "index": "heatmap_noise_calendar"},
+                figure=noise_heatmap_figure("TOUS", "TOUS"),
+            ),
             dmc.Select(
                 label="Type de bruit",
                 id="select-noise-source",
@@ -141,20 +212,80 @@ def generate_noise_figures():
                     {"group": "Tous type de bruit", "items": ["TOUS"]},
                     {
                         "group": "Type de bruit",
-                        "items": list(gdf_noise["source"].unique()),
+                        "items": list(get_noise_sensor_counts()["source"]["source"]),
                     },
                 ],
                 value="TOUS",
+                allowDeselect=False,
                 w=300,
             ),
             dcc.Graph(
                 id={"type": "graph", "index": "histo_noise_sensors"},
-                figure=histo_noise_sensors(gdf_noise, "TOUS"),
+                figure=histo_noise_sensors(get_noise_level_summary("TOUS"), "TOUS"),
+            ),
+            dmc.Text(
+                "Au-delà de la distribution, le nombre d’heures passées au-dessus de chaque seuil mesure l’exposition réelle des riverains. Les niveaux Lden et Lnight, moyennes énergétiques pondérées du soir (+5 dB) et de la nuit (+10 dB), sont les indicateurs de référence de la directive européenne sur le bruit ambiant."
+            ),
+            dmc.SegmentedControl(
+                id="SegmentedControl-noise-exceedance",
+                value="source",
+                data=[
+                    {"label": "Par type de bruit", "value": "source"},
+                    {"label": "Par district", "value": "district_name"},
+                ],
+            ),
+            dcc.Graph(
+                id={"type": "graph", "index": "bar_noise_exceedance"},
+                figure=bar_noise_exceedance(get_noise_analytics()["sources"], "source"),
+            ),
+            dmc.Text(
+                "Les épisodes anormaux sont les heures où un capteur dépasse de plus de trois écarts-types son niveau moyen de la semaine précédente, comme lors des festivités de la Saint-Jean."
+            ),
+            dcc.Graph(
+                id={"type": "graph", "index": "scatter_noise_events"},
+                figure=scatter_noise_events(get_noise_analytics()["events"]),
+            ),
+            dmc.Text(
+                "Les conditions météorologiques influencent aussi l’environnement sonore : la pluie, le vent ou la chaleur modifient à la fois les activités humaines et la propagation du bruit. Le graphique suivant croise le niveau de bruit moyen de chaque journée avec les relevés des stations météorologiques de la ville."
+            ),
+            dmc.Select(
+                label="Variable météorologique",
+                id="select-noise-weather",
+                data=[
+                    {"value": variable, "label": label}
+                    for variable, label in METEO_VARIABLES.items()
+                ],
+                value="TM",
+                allowDeselect=False,
+                w=300,
+            ),
+            dcc.Graph(
+                id={"type": "graph", "index": "scatter_noise_weather"},
+                figure=encode_figure(
+                    scatter_noise_weather(
+                        get_noise_weather(), "TOUS", "TM", METEO_VARIABLES["TM"]
+                    )
+                ),
             ),
         ],
     )
 
 
+def noise_heatmap_figure(source: str, district: str, color_scheme: str = "dark") -> dict:
+    source, district = source or "TOUS", district or "TOUS"
+    title = "Niveau de bruit moyen par jour et par heure à Barcelone en 2023"
+    if source != "TOUS" or district != "TOUS":
+        title += " (" + ", ".join(f for f in (source, district) if f != "TOUS") + ")"
+    return encode_figure(
+        heatmap_noise_calendar(
+            noise_heatmap(source, district),
+            get_noise_heatmap_cube()["days"],
+            title,
+            color_scheme,
+        )
+    )
+
+
 # - AIR QUALITY -
 
 
@@ -233,16 +364,23 @@ def create_air_quality_regulations_table():
     )
 
 
+def read_air_quality_map(polluant: str) -> str:
+    name = f"air_quality/air_quality_{polluant}"
+    path = os.path.join(ASSETS_PATH, f"{name}.html")
+    if not os.path.exists(path):
+        # The air quality maps are generated, not committed: the first read
+        # renders them
+        path = render_asset(name)
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
 def generate_air_quality_figures():
     return dmc.Group(
         [
             html.Iframe(
                 id="air-quality-map",
-                srcDoc=open(
-                    f"./assets/html/air_quality/air_quality_NO2.html",
-                    "r",
-                    encoding="utf-8",
-                ).read(),
+                srcDoc=read_air_quality_map("NO2"),
                 width="100%",
                 height="450px",
                 style={"border": "none"},
@@ -268,22 +406,24 @@ def trees_quantity_layout():
                     "Barcelone est une ville verte avec de nombreux arbres. La carte suivante illustre la densité d’arbres par kilomètre carré dans les divers secteurs de la ville, mettant en évidence les variations de couverture végétale selon les zones.",
                     id="text-nature",
                 ),
-                dmc.Group(
-                    html.Iframe(
-                        id="trees-map",
-                        srcDoc=open(
-                            f"./assets/html/trees/trees_per_km2.html",
-                            "r",
-                            encoding="utf-8",
-                        ).read(),
-                        width="100%",
-                        height="450px",
-                        style={"border": "none"},
+                dmc.SegmentedControl(
+                    id="SegmentedControl-trees",
+                    value="district",
+                    data=[
+                        {"label": "Par district", "value": "district"},
+                        {"label": "Par quartier", "value": "barri"},
+                        {"label": "Surface continue", "value": "surface"},
+                    ],
+                ),
+                dcc.Graph(
+                    id={"type": "graph", "index": "map_trees_density"},
+                    figure=map_trees_density(
+                        get_tree_rollup("district"),
+                        get_relative_path("/geojson/district.json"),
                     ),
-                    grow=True,
                 ),
                 dmc.Text(
-                    "L’analyse du graphique révèle que le centre-ville et les quartiers situés au nord de Barcelone présentent une densité d’arbres plus élevée, atteignant jusqu’à 6 400 arbres par km². Cette concentration est probablement due à une politique de verdissement renforcée dans ces zones, ainsi qu'à la présence de parcs et d'espaces verts aménagés. En revanche, les quartiers situés en périphérie sud et sud-ouest affichent une couverture arborée plus faible, avec des densités avoisinant 1 400 à 3 000 arbres par km². "
+                    "L’analyse du graphique révèle que le centre-ville et les quartiers situés au nord de Barcelone présentent une densité d’arbres plus élevée. Cette concentration est probablement due à une politique de verdissement renforcée dans ces zones, ainsi qu'à la présence de parcs et d'espaces verts aménagés. En revanche, les quartiers situés en périphérie sud et sud-ouest affichent une couverture arborée plus faible. Les densités sont calculées à partir de l’inventaire des arbres des rues, des zones et des parcs, rapporté à la superficie réelle de chaque district ou quartier. La surface continue répartit chaque arbre sur environ 200 m autour de sa position, sans dépendre des limites administratives."
                 ),
             ]
         ),
@@ -330,6 +470,44 @@ def hospitals_layout():
     )
 
 
+# - GRID -
+
+
+def grid_layout():
+    return dmc.Paper(
+        dmc.Stack(
+            [
+                dmc.Title("Carte fine de la ville", order=1),
+                dmc.Text(
+                    "Les moyennes par district masquent les écarts à l’intérieur de chaque district. La carte suivante agrège chaque jeu de données sur une grille hexagonale dont les cellules s’affinent à mesure que l’on zoome, de 1 km à 100 m."
+                ),
+                dmc.Select(
+                    label="Variable",
+                    id="select-grid-metric",
+                    data=[
+                        {"value": metric, "label": label}
+                        for metric, label in GRID_METRICS.items()
+                    ],
+                    value="trees",
+                    allowDeselect=False,
+                    w=300,
+                ),
+                dcc.Store(id="store-grid-resolution", data=resolution_for_zoom(GRID_ZOOM)),
+                dcc.Graph(
+                    id={"type": "graph", "index": "map_grid"},
+                    figure=encode_figure(
+                        map_grid(
+                            get_grid_layers_for_zoom(GRID_ZOOM), "trees", GRID_METRICS["trees"]
+                        )
+                    ),
+                ),
+            ]
+        ),
+        withBorder=True,
+        p="md",
+    )
+
+
 # - LIFE QUALITY -
 
 
@@ -382,8 +560,31 @@ def life_quality_layout():
     prevent_initial_call=True,
 )
 def noise_callback(checked, color_scheme):
-    print(color_scheme)
-    return noise_distribution(gdf_noise, checked, color_scheme)
+    return noise_distribution(get_noise_sensor_counts(), checked, color_scheme)
+
+
+@callback(
+    Output("select-noise-heatmap-district", "data"),
+    Output("select-noise-heatmap-district", "value"),
+    Input("select-noise-heatmap-source", "value"),
+    State("select-noise-heatmap-district", "value"),
+    prevent_initial_call=True,
+)
+def noise_heatmap_districts_callback(source, district):
+    # Only the districts where the source has sensors can be chosen
+    districts = noise_heatmap_districts(source)
+    return ["TOUS"] + districts, district if district in districts else "TOUS"
+
+
+@callback(
+    Output({"type": "graph", "index": "heatmap_noise_calendar"}, "figure"),
+    Input("select-noise-heatmap-source", "value"),
+    Input("select-noise-heatmap-district", "value"),
+    State("mantine-provider", "forceColorScheme"),
+    prevent_initial_call=True,
+)
+def noise_heatmap_callback(source, district, color_scheme):
+    return noise_heatmap_figure(source, district, color_scheme)
 
 
 @callback(
@@ -393,7 +594,34 @@ def noise_callback(checked, color_scheme):
     prevent_initial_call=True,
 )
 def noise_callback(source, color_scheme):
-    return histo_noise_sensors(gdf_noise, source, color_scheme)
+    return histo_noise_sensors(get_noise_level_summary(source), source, color_scheme)
+
+
+@callback(
+    Output({"type": "graph", "index": "bar_noise_exceedance"}, "figure"),
+    Input("SegmentedControl-noise-exceedance", "value"),
+    State("mantine-provider", "forceColorScheme"),
+    prevent_initial_call=True,
+)
+def noise_exceedance_callback(by, color_scheme):
+    analytics = get_noise_analytics()
+    df = analytics["sources"] if by == "source" else analytics["districts"]
+    return bar_noise_exceedance(df, by, color_scheme)
+
+
+@callback(
+    Output({"type": "graph", "index": "scatter_noise_weather"}, "figure"),
+    Input("select-noise-source", "value"),
+    Input("select-noise-weather", "value"),
+    State("mantine-provider", "forceColorScheme"),
+    prevent_initial_call=True,
+)
+def noise_weather_callback(source, variable, color_scheme):
+    return encode_figure(
+        scatter_noise_weather(
+            get_noise_weather(), source, variable, METEO_VARIABLES[variable], color_scheme
+        )
+    )
 
 
 @callback(
@@ -406,10 +634,6 @@ def noise_callback(source, color_scheme):
     prevent_initial_call=True,
 )
 def air_callback(polluant, color_scheme):
-    map = open(
-        f"./assets/html/air_quality/air_quality_{polluant}.html", "r", encoding="utf-8"
-    ).read()
-
     if polluant == "NO2":
         text = "Le dioxyde d’azote (NO2) est émis au cours de la combustion de combustibles, par exemple, dans les sites industriels et le secteur des transports (principalement des véhicules à moteur diesel). Voici un tableau résumant les normes de qualité de l'air pour celui-ci :"
     elif polluant == "PM10":
@@ -431,4 +655,47 @@ def air_callback(polluant, color_scheme):
             ],
         ],
     }
-    return text, data_table, map, histo_air_rang(gdf_air, polluant, x, color_scheme)
+    # The map is read from disk while the histogram is built
+    results = fetch(
+        map=lambda: read_air_quality_map(polluant),
+        histogram=lambda: histo_air_rang(gdf_air, polluant, x, color_scheme),
+    )
+    return text, data_table, results["map"], results["histogram"]
+
+
+@callback(
+    Output({"type": "graph", "index": "map_trees_density"}, "figure"),
+    Input("SegmentedControl-trees", "value"),
+    State("mantine-provider", "forceColorScheme"),
+    prevent_initial_call=True,
+)
+def trees_callback(level, color_scheme):
+    if level == "surface":
+        return map_trees_surface(get_tree_density_raster(), color_scheme)
+    return map_trees_density(
+        get_tree_rollup(level),
+        get_relative_path(f"/geojson/{level}.json"),
+        color_scheme,
+    )
+
+
+@callback(
+    Output({"type": "graph", "index": "map_grid"}, "figure"),
+    Output("store-grid-resolution", "data"),
+    Input({"type": "graph", "index": "map_grid"}, "relayoutData"),
+    Input("select-grid-metric", "value"),
+    State("store-grid-resolution", "data"),
+    State("mantine-provider", "forceColorScheme"),
+    prevent_initial_call=True,
+)
+def grid_callback(relayout, metric, resolution, color_scheme):
+    # Pans and zooms within the same resolution keep the current cells
+    zoom = (relayout or {}).get("mapbox.zoom")
+    new_resolution = resolution if zoom is None else resolution_for_zoom(zoom)
+    if ctx.triggered_id != "select-grid-metric" and new_resolution == resolution:
+        return no_update, no_update
+
+    fig = map_grid(
+        get_grid_layers(new_resolution), metric, GRID_METRICS[metric], color_scheme=color_scheme
+    )
+    return encode_figure(fig), new_resolution
@@ -1,54 +1,241 @@
-from dash import register_page, Output, Input, State, dcc, callback, html
+from dash import (
+    register_page,
+    get_relative_path,
+    Output,
+    Input,
+    State,
+    dcc,
+    callback,
+    html,
+    no_update,
+    Patch,
+)
 import dash_mantine_components as dmc
+import pandas as pd
 
-# from data.load_and_process_data import socio_eco_df, pca, pca_df, inertia
-# from view.socio_economic import (
-#     elbow_graph, corr_circle,
-# )
+from data.geometry import get_zones
+from data.population import DELTAS, get_population_delta
+from data.socio_economic import (
+    FEATURES,
+    K_RANGE,
+    get_clusters,
+    get_pca,
+    get_socio_economic_analysis,
+)
+from view.images import image_url
+from view.socio_economic import (
+    elbow_graph,
+    corr_circle,
+    scatter_pca,
+    corr_circle_pca,
+    map_population_delta,
+    patch_population_delta,
+)
+
+YEAR = 2021
+DEFAULT_K = 4
+COMPARED_YEARS = (2021, 2024)
 
 register_page(__name__, path="/socio-economic", name="Socio-économique", title="OPENDATA")
+
+
 def layout():
-    return
-# def layout():
-#     return dmc.Stack(
-#         [
-#             dmc.Title(
-#                     "Données socio-économiques des barris de la ville de Barcelone en 2021", order=1
-#                 ),
-#             dmc.Text(
-#                     "Les donnéees socio-économiques permettent de décrire les caractéristiques des habitants des différents quartiers de Barcelone. Ces caractéristiques ont un impact sur la qualité de vie."
-#                 ),
-#             dmc.Divider(),
-#             dmc.Title("ACP et classification", order=3),
-#             dmc.SimpleGrid(
-#                 [
-#                     dmc.Text(
-#                             "L'éboulis des valeurs propres (elbow) permet de déterminer le nombre de composantes principales à retenir. Nous avons choisi de créer 4 clusters pour la classification des quartiers sur nos données après ACP."
-#                         ),
-#                     dcc.Graph(
-#                             id={"type": "graph", "index": "elbow"},
-#                             figure=elbow_graph(inertia),
-#                         ),
-#                 ],
-#                 cols=2,
-#             ),
-#             html.Img(
-#                     id={"type": "image", "index": "corr_circle"},
-#                     src=corr_circle(pca, pca_df, socio_eco_df),
-#                 ),
-#             dmc.Text(
-#                     "D'après les graphiques ci-dessus, le cluster 0 regroupe les quartiers les plus riches avec un âge élevé, le cluster 1 regroupe les quartiers les plus jeunes, le cluster 2 regroupe les quartiers densément peuplés et avec un âge élevé et le cluster 3 regroupe les quartiers avec une plus grade proportion de femmes."
-#                 ),
-#             html.Iframe(
-#                 id="socio-economic-map",
-#                 srcDoc=open(
-#                     f"./assets/html/socio_economic/barri_clusters.html",
-#                     "r",
-#                     encoding="utf-8",
-#                 ).read(),
-#                 width="100%",
-#                 height="450px",
-#                 style={"border": "none"},
-#             ),
-#         ]
-#     )
\ No newline at end of file
+    analysis = get_socio_economic_analysis(YEAR)
+    return dmc.Stack(
+        [
+            dmc.Title(
+                    "Données socio-économiques des barris de la ville de Barcelone en 2021", order=1
+                ),
+            dmc.Text(
+                    "Les donnéees socio-économiques permettent de décrire les caractéristiques des habitants des différents quartiers de Barcelone. Ces caractéristiques ont un impact sur la qualité de vie."
+                ),
+            dmc.Divider(),
+            dmc.Title("ACP et classification", order=3),
+            dmc.SimpleGrid(
+                [
+                    dmc.Text(
+                            "L'éboulis des valeurs propres (elbow) permet de déterminer le nombre de composantes principales à retenir. Nous avons choisi de créer 4 clusters pour la classification des quartiers sur nos données après ACP."
+                        ),
+                    dcc.Graph(
+                            id={"type": "graph", "index": "elbow"},
+                            figure=elbow_graph(analysis["inertia"]),
+                        ),
+                ],
+                cols=2,
+            ),
+            html.Img(
+                    id={"type": "image", "index": "corr_circle"},
+                    src=image_url(
+                        corr_circle,
+                        analysis["pca"],
+                        analysis["pca_df"],
+                        analysis["features"],
+                    ),
+                ),
+            dmc.Text(
+                    "D'après les graphiques ci-dessus, le cluster 0 regroupe les quartiers les plus riches avec un âge élevé, le cluster 1 regroupe les quartiers les plus jeunes, le cluster 2 regroupe les quartiers densément peuplés et avec un âge élevé et le cluster 3 regroupe les quartiers avec une plus grade proportion de femmes."
+                ),
+            html.Iframe(
+                id="socio-economic-map",
+                srcDoc=open(
+                    f"./assets/html/socio_economic/barri_clusters.html",
+                    "r",
+                    encoding="utf-8",
+                ).read(),
+                width="100%",
+                height="450px",
+                style={"border": "none"},
+            ),
+            dmc.Divider(),
+            exploration_section(),
+            dmc.Divider(),
+            population_delta_section(),
+        ]
+    )
+
+
+def exploration_section() -> dmc.Stack:
+    features = tuple(FEATURES)
+    clusters = get_clusters(YEAR, features)
+    return dmc.Stack(
+        [
+            dmc.Title("Exploration de la classification", order=3),
+            dmc.Text(
+                "Choisissez les variables utilisées pour l'ACP et le nombre de clusters. Les projections et les classifications de chaque nombre de clusters sont calculées une seule fois par choix de variables."
+            ),
+            dmc.Group(
+                [
+                    dmc.MultiSelect(
+                        id="multiselect-socio-features",
+                        label="Variables",
+                        data=FEATURES,
+                        value=FEATURES,
+                        style={"width": 600},
+                    ),
+                    dmc.Stack(
+                        [
+                            dmc.Text("Nombre de clusters", size="sm"),
+                            dmc.Slider(
+                                id="slider-socio-k",
+                                min=K_RANGE[1],
+                                max=K_RANGE[-1],
+                                value=DEFAULT_K,
+                                marks=[{"value": k, "label": str(k)} for k in K_RANGE[1:]],
+                                style={"width": 300},
+                            ),
+                        ],
+                        gap=0,
+                    ),
+                ],
+                align="flex-end",
+            ),
+            dmc.SimpleGrid(
+                [
+                    dcc.Graph(
+                        id={"type": "graph", "index": "scatter_pca"},
+                        figure=scatter_pca(
+                            get_pca(YEAR, features)["projection"],
+                            clusters["labels"][DEFAULT_K],
+                        ),
+                    ),
+                    dcc.Graph(
+                        id={"type": "graph", "index": "corr_circle_pca"},
+                        figure=corr_circle_pca(get_pca(YEAR, features)["loadings"]),
+                    ),
+                    dcc.Graph(
+                        id={"type": "graph", "index": "elbow_pca"},
+                        figure=elbow_graph(clusters["inertia"]),
+                    ),
+                ],
+                cols=3,
+            ),
+        ]
+    )
+
+
+def population_deltas() -> pd.DataFrame:
+    # Barri names and codes next to the deltas, in the order of the geometry
+    return get_zones("barri")[["code", "name"]].join(
+        get_population_delta(*COMPARED_YEARS), on="code"
+    )
+
+
+def population_delta_section() -> dmc.Stack:
+    return dmc.Stack(
+        [
+            dmc.Title(
+                f"Évolution de la population entre {COMPARED_YEARS[0]} et {COMPARED_YEARS[1]}",
+                order=3,
+            ),
+            dmc.Text(
+                "La carte compare le registre de population des deux années pour chaque barri : croissance de la population, vieillissement, part de femmes et part des 65 ans et plus."
+            ),
+            dmc.SegmentedControl(
+                id="SegmentedControl-population-delta",
+                value="growth",
+                data=[{"value": delta, "label": label} for delta, label in DELTAS.items()],
+            ),
+            dcc.Graph(
+                id={"type": "graph", "index": "map_population_delta"},
+                figure=map_population_delta(
+                    population_deltas(),
+                    get_relative_path("/geojson/barri.json"),
+                    "growth",
+                    DELTAS["growth"],
+                ),
+            ),
+        ]
+    )
+
+
+# --- CALLBACKS ---
+
+
+@callback(
+    Output({"type": "graph", "index": "scatter_pca"}, "figure"),
+    Output({"type": "graph", "index": "corr_circle_pca"}, "figure"),
+    Output({"type": "graph", "index": "elbow_pca"}, "figure"),
+    Input("multiselect-socio-features", "value"),
+    State("slider-socio-k", "value"),
+    State("mantine-provider", "forceColorScheme"),
+)
+def features_callback(features, k, color_scheme):
+    if len(features) < 2:
+        return no_update, no_update, no_update
+
+    # Sorted so that the same subset always hits the same cache entry
+    features = tuple(sorted(features, key=FEATURES.index))
+    pca = get_pca(YEAR, features)
+    clusters = get_clusters(YEAR, features)
+    return (
+        scatter_pca(pca["projection"], clusters["labels"][k], color_scheme),
+        corr_circle_pca(pca["loadings"], color_scheme),
+        elbow_graph(clusters["inertia"]),
+    )
+
+
+@callback(
+    Output({"type": "graph", "index": "scatter_pca"}, "figure", allow_duplicate=True),
+    Input("slider-socio-k", "value"),
+    State("multiselect-socio-features", "value"),
+    prevent_initial_call=True,
+)
+def k_callback(k, features):
+    if len(features) < 2:
+        return no_update
+
+    # Only the cluster of each barri changes, the projection stays in place
+    labels = get_clusters(YEAR, tuple(sorted(features, key=FEATURES.index)))["labels"][k]
+    patched_fig = Patch()
+    patched_fig["data"][0]["marker"]["color"] = labels.tolist()
+    patched_fig["data"][0]["marker"]["cmax"] = int(labels.max())
+    patched_fig["data"][0]["customdata"] = labels.tolist()
+    return patched_fig
+
+
+@callback(
+    Output({"type": "graph", "index": "map_population_delta"}, "figure"),
+    Input("SegmentedControl-population-delta", "value"),
+)
+def population_delta_callback(delta):
+    return patch_population_delta(population_deltas(), delta, DELTAS[delta])
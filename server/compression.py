@@ -0,0 +1,135 @@
+import argparse
+import gzip
+import mimetypes
+import os
+
+import brotli
+from flask import Flask, Response, request, send_file
+from flask_compress import Compress
+from werkzeug.security import safe_join
+
+# Responses smaller than this are not worth the compression
+MIN_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = [
+    "application/geo+json",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+]
+COMPRESSIBLE_EXTENSIONS = (".css", ".geojson", ".html", ".js", ".json", ".svg", ".txt")
+
+# Precompressed siblings, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+# --- PRECOMPRESSED ASSETS ---
+
+
+def _is_fresh(path: str, sibling: str) -> bool:
+    return os.path.exists(sibling) and os.path.getmtime(sibling) >= os.path.getmtime(path)
+
+
+def _write(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def precompress_assets(folder: str) -> list[str]:
+    """
+    Write the .br and .gz siblings of the compressible assets at maximum
+    compression, skipping the siblings newer than their file.
+
+    Returns
+    -------
+    list[str]
+        Paths of the written siblings.
+    """
+    written = []
+    for directory, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(directory, name)
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS) or os.path.getsize(path) < MIN_SIZE:
+                continue
+
+            with open(path, "rb") as file:
+                data = file.read()
+            for encoding, extension in ENCODINGS.items():
+                sibling = path + extension
+                if _is_fresh(path, sibling):
+                    continue
+                _write(
+                    sibling,
+                    brotli.compress(data, quality=11)
+                    if encoding == "br"
+                    # No timestamp in the header, so rebuilds give the same file
+                    else gzip.compress(data, compresslevel=9, mtime=0),
+                )
+                written.append(sibling)
+    return written
+
+
+def _precompressed_asset(folder: str, url_path: str):
+    def serve() -> Response | None:
+        if request.method != "GET" or not request.path.startswith(url_path):
+            return None
+
+        path = safe_join(folder, request.path[len(url_path) :])
+        if path is None or not os.path.isfile(path):
+            return None
+
+        for encoding, extension in ENCODINGS.items():
+            if request.accept_encodings[encoding] and _is_fresh(path, path + extension):
+                response = send_file(
+                    path + extension,
+                    mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                    conditional=True,
+                )
+                response.headers["Content-Encoding"] = encoding
+                response.vary.add("Accept-Encoding")
+                return response
+        return None
+
+    return serve
+
+
+def init_compression(server: Flask, assets_folder: str, assets_url_path: str) -> None:
+    """
+    Compress the dynamic responses with brotli or gzip depending on the
+    Accept-Encoding of the client, from MIN_SIZE bytes. The assets having
+    precompressed siblings, written by `python -m server.compression`, are
+    served from them instead.
+
+    Must be called before the other server hooks, so they see the responses
+    uncompressed.
+    """
+    server.config.update(
+        COMPRESS_ALGORITHM=list(ENCODINGS),
+        COMPRESS_MIMETYPES=COMPRESSIBLE_MIMETYPES,
+        COMPRESS_MIN_SIZE=MIN_SIZE,
+        # Fast levels for responses compressed on each request
+        COMPRESS_BR_LEVEL=4,
+        COMPRESS_LEVEL=6,
+    )
+    Compress(server)
+    server.before_request(_precompressed_asset(assets_folder, assets_url_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write the .br and .gz siblings of the compressible assets."
+    )
+    parser.add_argument("folder", nargs="?", default="./assets", help="assets folder")
+    args = parser.parse_args()
+
+    for path in precompress_assets(args.folder):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+import time
+
+from flask import Flask, Response, g, request
+
+from server.metrics import CALLBACK_PATH
+
+# Identical callback requests received within this delay share one response
+DEDUPE_WINDOW = 1.0
+# Longest wait on an identical request still running
+DEDUPE_TIMEOUT = 30.0
+DEDUPE_MAX_ENTRIES = 1024
+
+# --- REQUEST DEDUPLICATION ---
+
+
+class _Entry:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: tuple[int, dict, bytes] | None = None
+        self.finished_at = None
+
+
+_entries: dict[str, _Entry] = {}
+_lock = threading.Lock()
+
+
+def _prune(now: float) -> None:
+    for key in [
+        key
+        for key, entry in _entries.items()
+        if entry.finished_at is not None and now - entry.finished_at > DEDUPE_WINDOW
+    ]:
+        del _entries[key]
+
+
+def _before_request() -> Response | None:
+    if not (request.path.endswith(CALLBACK_PATH) and request.method == "POST"):
+        return None
+
+    key = hashlib.sha1(request.get_data()).hexdigest()
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry.finished_at is not None:
+            if now - entry.finished_at > DEDUPE_WINDOW:
+                entry = None
+        if entry is None:
+            if len(_entries) >= DEDUPE_MAX_ENTRIES:
+                _prune(now)
+            _entries[key] = _Entry()
+            g.dedupe_key = key
+            return None
+
+    # An identical request is running or has just finished, reuse its response
+    if entry.done.wait(DEDUPE_TIMEOUT) and entry.response is not None:
+        status, headers, body = entry.response
+        return Response(body, status=status, headers=headers)
+    return None
+
+
+def _after_request(response: Response) -> Response:
+    key = g.pop("dedupe_key", None)
+    if key is None:
+        return response
+
+    entry = _entries.get(key)
+    if entry is not None:
+        if response.status_code in (200, 204) and not response.direct_passthrough:
+            entry.response = (
+                response.status_code,
+                {"Content-Type": response.content_type},
+                response.get_data(),
+            )
+        _finish(key, entry)
+    return response
+
+
+def _finish(key: str, entry: _Entry) -> None:
+    with _lock:
+        entry.finished_at = time.monotonic()
+        if entry.response is None:
+            # Failed requests are not shared, the next identical one runs again
+            _entries.pop(key, None)
+    entry.done.set()
+
+
+def _teardown_request(_) -> None:
+    key = g.pop("dedupe_key", None)
+    entry = _entries.get(key) if key is not None else None
+    if entry is not None and not entry.done.is_set():
+        _finish(key, entry)
+
+
+def init_coordination(server: Flask) -> None:
+    """
+    Share the response of a callback request with the identical requests
+    arriving while it runs or within DEDUPE_WINDOW seconds after, e.g. many
+    clients loading the same page or flipping the theme at once. The
+    callbacks of the app only depend on their inputs and states, so an
+    identical request body always gets the same response.
+    """
+    server.before_request(_before_request)
+    server.after_request(_after_request)
+    server.teardown_request(_teardown_request)
@@ -0,0 +1,154 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable
+
+import dash._callback
+from flask import Flask, Response, g, has_request_context, request
+
+from data.cache import add_cache_listener
+
+CALLBACK_PATH = "/_dash-update-component"
+
+# Upper bounds of the histogram buckets, +Inf being implicit
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+# Cache status of a callback, from the least to the most expensive
+CACHE_STATUSES = ("hit", "disk", "build")
+
+# --- HISTOGRAMS ---
+
+
+class Histogram:
+    """
+    Prometheus histogram with one series per label set. Observing a value is
+    a bisection and two additions under a lock.
+    """
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple[tuple[str, str], ...], value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def exposition(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (counts[:], total) for labels, (counts, total) in self._series.items()}
+
+        for labels, (counts, total) in sorted(series.items()):
+            label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+CALLBACK_DURATION = Histogram(
+    "dash_callback_duration_seconds",
+    "Wall time of the callback requests, serialization included.",
+    DURATION_BUCKETS,
+)
+CALLBACK_SERIALIZATION = Histogram(
+    "dash_callback_serialization_seconds",
+    "Time spent serializing the callback outputs to JSON.",
+    DURATION_BUCKETS,
+)
+CALLBACK_RESPONSE_SIZE = Histogram(
+    "dash_callback_response_bytes",
+    "Size of the callback response bodies.",
+    SIZE_BUCKETS,
+)
+HISTOGRAMS = [CALLBACK_DURATION, CALLBACK_SERIALIZATION, CALLBACK_RESPONSE_SIZE]
+
+# --- INSTRUMENTATION ---
+
+
+def _timed_to_json(to_json: Callable) -> Callable:
+    def timed(obj):
+        start = time.perf_counter()
+        try:
+            return to_json(obj)
+        finally:
+            if has_request_context():
+                g.metrics_serialization += time.perf_counter() - start
+
+    return timed
+
+
+def _record_cache(status: str) -> None:
+    if has_request_context() and "metrics_start" in g:
+        current = CACHE_STATUSES.index(g.metrics_cache)
+        g.metrics_cache = CACHE_STATUSES[max(current, CACHE_STATUSES.index(status))]
+
+
+def _before_request() -> None:
+    if request.path.endswith(CALLBACK_PATH) and request.method == "POST":
+        g.metrics_start = time.perf_counter()
+        g.metrics_serialization = 0.0
+        g.metrics_cache = "hit"
+
+
+def _after_request(response: Response) -> Response:
+    if "metrics_start" not in g:
+        return response
+
+    duration = time.perf_counter() - g.metrics_start
+    body = request.get_json(silent=True) or {}
+    labels = (
+        ("output", str(body.get("output", ""))),
+        ("cache", g.metrics_cache),
+        ("status", str(response.status_code)),
+    )
+    CALLBACK_DURATION.observe(labels, duration)
+    CALLBACK_SERIALIZATION.observe(labels, g.metrics_serialization)
+    CALLBACK_RESPONSE_SIZE.observe(
+        labels, 0 if response.direct_passthrough else len(response.get_data())
+    )
+    return response
+
+
+def metrics() -> Response:
+    lines = [line for histogram in HISTOGRAMS for line in histogram.exposition()]
+    return Response(
+        "\n".join(lines) + "\n",
+        mimetype="text/plain; version=0.0.4",
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+def init_metrics(server: Flask) -> None:
+    """
+    Record the wall time, serialization time, response size and cache status
+    of every callback request, labelled by the output id of the callback, and
+    expose them in the Prometheus text format on /metrics.
+
+    The cache status is "hit" when no load_or_build call was made, "disk"
+    when an artifact was read from the cache directory and "build" when one
+    was computed. Each server process keeps its own histograms.
+    """
+    dash._callback.to_json = _timed_to_json(dash._callback.to_json)
+    add_cache_listener(_record_cache)
+
+    server.before_request(_before_request)
+    server.after_request(_after_request)
+    server.add_url_rule("/metrics", "metrics", metrics)
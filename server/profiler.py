@@ -0,0 +1,177 @@
+import html
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from flask import Flask, Response, abort, g, request
+
+from data.cache import CACHE_PATH
+from server.metrics import CALLBACK_PATH
+
+# Fraction of the requests to profile, 0 disables the sampling
+PROFILE_RATE = float(os.environ.get("OPENDATA_PROFILE_RATE", "0"))
+# Requests sending this token in the PROFILE_HEADER are always profiled
+PROFILE_TOKEN = os.environ.get("OPENDATA_PROFILE_TOKEN", "")
+PROFILE_HEADER = "X-Opendata-Profile"
+PROFILE_INTERVAL = float(os.environ.get("OPENDATA_PROFILE_INTERVAL", "0.005"))
+PROFILE_PATH = os.environ.get("OPENDATA_PROFILE_PATH", CACHE_PATH + "profiles/")
+
+RECENT_PROFILES = 200
+
+_NAME_PATTERN = re.compile(r"[\w.-]+\.txt")
+
+# --- SAMPLING ---
+
+
+class Sampler:
+    """
+    Statistical profiler of the threads serving the profiled requests. A
+    single daemon thread reads their current stack every interval, so the
+    requests themselves only pay for registering and unregistering.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stacks: dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id: int) -> None:
+        with self._lock:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._stacks.pop(thread_id, Counter())
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._stacks:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own_id:
+                        stacks[_collapse(frame)] += 1
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+_sampler = Sampler(PROFILE_INTERVAL)
+_recent: deque = deque(maxlen=RECENT_PROFILES)
+
+# --- REQUESTS ---
+
+
+def _request_label() -> str:
+    """
+    Page path for the page layouts and output id for the other callbacks,
+    the URL path for plain requests.
+    """
+    if not request.path.endswith(CALLBACK_PATH):
+        return request.path
+
+    body = request.get_json(silent=True) or {}
+    output = str(body.get("output", ""))
+    if "_pages_content.children" in output:
+        for item in body.get("inputs", []):
+            if item.get("property") == "pathname":
+                return f"page:{item.get('value')}"
+    return output
+
+
+def _is_profiled() -> bool:
+    if PROFILE_TOKEN and request.headers.get(PROFILE_HEADER) == PROFILE_TOKEN:
+        return True
+    return random.random() < PROFILE_RATE
+
+
+def _before_request() -> None:
+    if _is_profiled():
+        g.profile_start = time.perf_counter()
+        _sampler.start(threading.get_ident())
+
+
+def _after_request(response: Response) -> Response:
+    if "profile_start" not in g:
+        return response
+
+    stacks = _sampler.stop(threading.get_ident())
+    duration = time.perf_counter() - g.profile_start
+    label = _request_label()
+
+    name = "{}_{}_{:.0f}ms.txt".format(
+        time.strftime("%Y%m%dT%H%M%S"),
+        re.sub(r"[^\w.-]+", "-", label).strip("-")[:80] or "root",
+        duration * 1000,
+    )
+    os.makedirs(PROFILE_PATH, exist_ok=True)
+    with open(os.path.join(PROFILE_PATH, name), "w") as file:
+        file.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+
+    _recent.append((duration, label, name, sum(stacks.values())))
+    return response
+
+
+# --- VIEWER ---
+
+
+def profiles() -> str:
+    """Slowest of the recently profiled requests, with links to their stacks."""
+    rows = "".join(
+        f"<tr><td>{duration * 1000:.0f} ms</td><td>{samples}</td>"
+        f"<td>{html.escape(label)}</td>"
+        f'<td><a href="profiles/{name}">{name}</a></td></tr>'
+        for duration, label, name, samples in sorted(_recent, reverse=True)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Profiles</title></head><body>"
+        f"<h1>Slowest profiled requests ({len(_recent)} recent)</h1>"
+        "<table><tr><th>Duration</th><th>Samples</th><th>Request</th><th>Stacks</th></tr>"
+        f"{rows}</table></body></html>"
+    )
+
+
+def profile(name: str) -> Response:
+    """Collapsed stacks of a profile, one "frame;frame;frame count" line per stack."""
+    path = os.path.join(PROFILE_PATH, name)
+    if not _NAME_PATTERN.fullmatch(name) or not os.path.exists(path):
+        abort(404)
+    with open(path) as file:
+        return Response(file.read(), mimetype="text/plain")
+
+
+def init_profiler(server: Flask) -> None:
+    """
+    Profile a fraction of the requests when OPENDATA_PROFILE_RATE is set, or
+    the requests sending OPENDATA_PROFILE_TOKEN in the X-Opendata-Profile
+    header. The collapsed stacks are written in PROFILE_PATH, readable by
+    flamegraph.pl or speedscope, and the slowest recent requests are listed
+    on /profiles. Nothing is registered when both variables are unset.
+    """
+    if PROFILE_RATE <= 0 and not PROFILE_TOKEN:
+        return
+
+    server.before_request(_before_request)
+    server.after_request(_after_request)
+    server.add_url_rule("/profiles", "profiles", profiles)
+    server.add_url_rule("/profiles/<name>", "profile", profile)
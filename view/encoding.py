@@ -0,0 +1,81 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Numeric types plotly.js decodes from base64, by their numpy name
+TYPED_ARRAY_DTYPES = {
+    "int8": "i1",
+    "uint8": "u1",
+    "int16": "i2",
+    "uint16": "u2",
+    "int32": "i4",
+    "uint32": "u4",
+    "float32": "f4",
+    "float64": "f8",
+}
+
+# Shorter arrays are smaller as a number list than in base64
+MIN_TYPED_ARRAY_SIZE = 100
+
+# --- TYPED ARRAYS ---
+
+
+def typed_array(array: np.ndarray) -> dict | np.ndarray:
+    """
+    Plotly typed array of a numeric array: its little-endian bytes in base64
+    with their type and shape, decoded by plotly.js without parsing a number
+    list. plotly.js has no 64 bits integers: int64 arrays are narrowed to
+    int32 when their values fit, else sent as float64, exact up to 2^53.
+    Other arrays, e.g. of strings or dates, are returned as is.
+    """
+    if array.dtype == "int64":
+        fits = array.size == 0 or (
+            np.iinfo("int32").min <= array.min() <= array.max() <= np.iinfo("int32").max
+        )
+        array = array.astype("int32" if fits else "float64")
+    if array.dtype.name not in TYPED_ARRAY_DTYPES:
+        return array
+
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    return {
+        "dtype": TYPED_ARRAY_DTYPES[array.dtype.name],
+        "bdata": base64.b64encode(array.tobytes()).decode("ascii"),
+        "shape": ",".join(map(str, array.shape)),
+    }
+
+
+def _encode(value):
+    if isinstance(value, np.ndarray) and value.size >= MIN_TYPED_ARRAY_SIZE:
+        return typed_array(value)
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def encode_figure(fig: go.Figure) -> dict:
+    """
+    Figure as a dict whose numeric arrays of the traces are typed arrays,
+    ready for the `figure` of a dcc.Graph. Applied by the pages to the
+    figures carrying long arrays, the others are sent as they are.
+    """
+    figure = fig.to_dict()
+    figure["data"] = _encode(figure["data"])
+    return figure
+
+
+def time_axis(dates: pd.DatetimeIndex, axis: str = "x") -> dict:
+    """
+    Trace arguments placing values at `dates` on a date axis: a start and a
+    step when they are evenly spaced, else epoch milliseconds, so no date
+    string is sent per point.
+    """
+    milliseconds = dates.as_unit("ms").asi8
+    steps = np.diff(milliseconds)
+    if len(dates) > 1 and (steps == steps[0]).all():
+        return {f"{axis}0": dates[0].isoformat(), f"d{axis}": int(steps[0])}
+    return {axis: milliseconds.astype("float64")}
+
@@ -0,0 +1,177 @@
+import glob
+import hashlib
+import multiprocessing
+import os
+import pickle
+import re
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from dash import get_relative_path
+from flask import Flask
+
+from data.cache import CACHE_PATH
+
+IMAGE_PATH = CACHE_PATH + "images/"
+IMAGE_WORKERS = 2
+
+_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+_executor: ProcessPoolExecutor | None = None
+_pending: dict[str, Future] = {}
+_lock = threading.Lock()
+_started = False
+
+# --- RENDERING ---
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # The server workers run threads, which a fork would copy in a broken
+        # state: the render processes start from a fresh interpreter instead
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def _reset_after_fork() -> None:
+    # A forked server worker does not inherit the pool of its parent
+    global _executor, _lock, _started
+    _executor = None
+    _pending.clear()
+    _lock = threading.Lock()
+    _started = False
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _image_path(key: str, extension: str = "png") -> str:
+    return f"{IMAGE_PATH}{key}.{extension}"
+
+
+def _render(key: str, render: Callable[..., bytes], args: tuple, kwargs: dict) -> None:
+    # Runs in a worker process
+    png = render(*args, **kwargs)
+    tmp_path = f"{_image_path(key)}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(png)
+    os.replace(tmp_path, _image_path(key))
+
+
+def _submit(key: str, spec: tuple) -> Future:
+    global _executor
+    with _lock:
+        if key not in _pending:
+            try:
+                future = _get_executor().submit(_render, key, *spec)
+            except BrokenProcessPool:
+                # A render process died, e.g. killed for its memory: the pool
+                # refuses any new work, so it is replaced
+                _executor.shutdown(wait=False)
+                _executor = None
+                future = _get_executor().submit(_render, key, *spec)
+            future.add_done_callback(lambda _: _pending.pop(key, None))
+            _pending[key] = future
+        return _pending[key]
+
+
+def image_url(render: Callable[..., bytes], *args: Any, **kwargs: Any) -> str:
+    """
+    URL of a static plot rendered server side. The image is keyed by the hash
+    of the render function and its arguments. It is rendered once in a worker
+    process, then served from the cache directory with immutable headers.
+
+    Parameters
+    ----------
+    render : Callable[..., bytes]
+        Module level function returning the PNG bytes of the plot.
+    *args, **kwargs
+        Picklable arguments of the render function.
+
+    Returns
+    -------
+    str
+        The URL of the image, to be used as the src of an html.Img.
+    """
+    spec = (render, args, kwargs)
+    payload = pickle.dumps((render.__module__, render.__qualname__, args, kwargs))
+    key = hashlib.sha256(payload).hexdigest()
+
+    if not os.path.exists(_image_path(key)):
+        os.makedirs(IMAGE_PATH, exist_ok=True)
+
+        # The spec lets any server worker render the image on its first request
+        spec_path = _image_path(key, "pkl")
+        if not os.path.exists(spec_path):
+            tmp_path = f"{spec_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as file:
+                pickle.dump(spec, file)
+            os.replace(tmp_path, spec_path)
+
+        _submit(key, spec)
+
+    return get_relative_path(f"/images/{key}.png")
+
+
+def get_image(key: str) -> bytes | None:
+    """
+    PNG bytes of an image, None while it is not rendered or for unknown keys.
+    Never waits for a rendering, see render_image.
+    """
+    if not _KEY_PATTERN.fullmatch(key) or not os.path.exists(_image_path(key)):
+        return None
+    with open(_image_path(key), "rb") as file:
+        return file.read()
+
+
+def render_image(key: str) -> bool:
+    """
+    Start rendering an image from its spec if it is not already running.
+    Returns False for unknown keys.
+    """
+    spec_path = _image_path(key, "pkl")
+    if not _KEY_PATTERN.fullmatch(key) or not os.path.exists(spec_path):
+        return False
+    with open(spec_path, "rb") as file:
+        _submit(key, pickle.load(file))
+    return True
+
+
+def render_known_images() -> list[str]:
+    """
+    Start rendering the images whose spec is on disk but not their PNG, e.g.
+    after the cache was cleared, so they are ready before being requested.
+
+    Returns
+    -------
+    list[str]
+        Keys of the images being rendered.
+    """
+    keys = [
+        os.path.basename(path)[: -len(".pkl")]
+        for path in glob.glob(_image_path("*", "pkl"))
+    ]
+    return [key for key in keys if get_image(key) is None and render_image(key)]
+
+
+def _before_request() -> None:
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    render_known_images()
+
+
+def init_images(server: Flask) -> None:
+    """
+    Render the known images missing from the cache once the server handles
+    its first request. Not at import: the render processes are spawned and
+    import the main module again, which must not start processes itself.
+    """
+    server.before_request(_before_request)
@@ -1,12 +1,20 @@
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-import plotly.express as px
+import shapely
 import plotly.graph_objects as go
 import plotly.io as pio
-import folium
+from plotly.colors import qualitative, sequential
+from plotly.subplots import make_subplots
+
+from view.encoding import time_axis
+from view.maps import PRECISION, render_map
 
 CENTER_BARCELONA = {"lat": 41.3951, "lon": 2.1734}
 
+# Colors of the 40 to 90 dB noise thresholds
+NOISE_THRESHOLD_COLORS = ["#0037A7", "#0097A7", "#74BE41", "#D5DE20", "#EF4429", "#FF0000"]
+
 
 def get_color_theme(color_scheme: str):
     return (
@@ -19,15 +27,16 @@ def get_color_theme(color_scheme: str):
 # --- Noise ---
 
 
-def map_noise_sensors(gdf: gpd.GeoDataFrame, color_scheme: str = "dark") -> go.Figure:
-    gdf_map = gdf.drop_duplicates("id")
+def map_noise_sensors(sensors: pd.DataFrame, color_scheme: str = "dark") -> go.Figure:
+    import plotly.express as px
+
     fig = px.scatter_mapbox(
-        gdf_map,
-        lat=gdf_map.geometry.y,
-        lon=gdf_map.geometry.x,
+        sensors,
+        lat="lat",
+        lon="lon",
         color="source",
         hover_name="source",
-        hover_data=["noise_level", "district_name", "area_name"],
+        hover_data={"district_name": True, "area_name": True, "lat": False, "lon": False},
         center=CENTER_BARCELONA,
         zoom=12,
         width=800,
@@ -43,24 +52,36 @@ def map_noise_sensors(gdf: gpd.GeoDataFrame, color_scheme: str = "dark") -> go.F
 
 
 def noise_distribution(
-    gdf: gpd.GeoDataFrame, has_district: bool, color_scheme: str = "dark"
+    counts: dict, has_district: bool, color_scheme: str = "dark"
 ) -> go.Figure:
+    import plotly.express as px
+
     if has_district:
-        fig = px.sunburst(
-            gdf.drop_duplicates("id"),
-            path=["district_name", "source"],
+        # Districts at the center, their sources around
+        districts = counts["district"]["district_name"].astype(str)
+        leaves = counts["district_source"]
+        parents = leaves["district_name"].astype(str)
+        sources = leaves["source"].astype(str)
+        fig = go.Figure(
+            go.Sunburst(
+                ids=pd.concat([districts, parents + "/" + sources]),
+                labels=pd.concat([districts, sources]),
+                parents=pd.concat([pd.Series("", index=districts.index), parents]),
+                values=pd.concat([counts["district"]["count"], leaves["count"]]),
+                branchvalues="total",
+                textinfo="label+percent entry",
+            )
+        )
+        fig.update_layout(
             template=get_color_theme(color_scheme),
             height=400,
             width=400,
-        )
-        fig.update_traces(textinfo="label+percent entry")
-        fig.update_layout(
             margin={"r": 0, "t": 0, "l": 0, "b": 0},
         )
         return fig
 
     fig = px.pie(
-        gdf.drop_duplicates("id").value_counts("source").reset_index(),
+        counts["source"],
         names="source",
         values="count",
         template=get_color_theme(color_scheme),
@@ -76,37 +97,121 @@ def noise_distribution(
 
 
 def line_noise_level(gdf: gpd.GeoDataFrame, color_scheme: str = "dark") -> go.Figure:
-    fig = px.line(
-        gdf.groupby("date")["noise_level"].mean().reset_index(),
-        x="date",
-        y="noise_level",
+    levels = gdf.groupby("date")["noise_level"].mean().astype("float32")
+    fig = go.Figure(
+        go.Scatter(
+            y=levels.to_numpy(),
+            mode="lines",
+            hovertemplate="%{x}<br>%{y:.1f} dB<extra></extra>",
+            **time_axis(levels.index),
+        )
+    )
+    fig.update_layout(
         title="Niveaux de bruit moyen à Barcelone en 2023",
+        xaxis={"type": "date", "title": "date"},
+        yaxis_title="noise_level",
         template=get_color_theme(color_scheme),
     )
 
     return fig
 
 
+def heatmap_noise_calendar(
+    z: np.ndarray, days: pd.DatetimeIndex, title: str, color_scheme: str = "dark"
+) -> go.Figure:
+    # Days as evenly spaced columns, so only the levels are sent
+    fig = go.Figure(
+        go.Heatmap(
+            z=z.T,
+            y0=0,
+            dy=1,
+            colorscale="Turbo",
+            colorbar={"title": "dB"},
+            hovertemplate="%{x|%d %b}, %{y} h : %{z:.1f} dB<extra></extra>",
+            **time_axis(days),
+        )
+    )
+    fig.update_layout(
+        title=title,
+        xaxis={"type": "date", "title": None},
+        yaxis={"title": "Heure", "dtick": 3},
+        template=get_color_theme(color_scheme),
+    )
+    if np.isnan(z).all():
+        fig.add_annotation(
+            text="Aucun capteur pour cette sélection",
+            xref="paper",
+            yref="paper",
+            x=0.5,
+            y=0.5,
+            showarrow=False,
+            font={"size": 16},
+        )
+    return fig
+
+
 def histo_noise_sensors(
-    gdf: gpd.GeoDataFrame, source: str, color_scheme: str = "dark"
+    summary: dict, source: str, color_scheme: str = "dark"
 ) -> go.Figure:
-    gdf = gdf[gdf["source"] == source] if source != "TOUS" else gdf
     title = (
         f"Distribution des niveaux de bruit moyen des capteurs {source} à Barcelone en 2023"
         if source != "TOUS"
         else f"Distribution des niveaux de bruit moyen des capteurs à Barcelone en 2023"
     )
-    fig = px.histogram(
-        gdf.groupby(["date"], observed=False)["noise_level"].mean().reset_index(),
-        x="noise_level",
-        marginal="box",
-        title=title,
-        template=get_color_theme(color_scheme),
+    edges = summary["edges"]
+    fig = make_subplots(
+        rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02
+    )
+    fig.add_trace(
+        go.Box(
+            q1=[summary["q1"]],
+            median=[summary["median"]],
+            q3=[summary["q3"]],
+            lowerfence=[summary["lowerfence"]],
+            upperfence=[summary["upperfence"]],
+            mean=[summary["mean"]],
+            y=["noise_level"],
+            orientation="h",
+            name="noise_level",
+            marker_color=qualitative.Plotly[0],
+            showlegend=False,
+        ),
+        row=1,
+        col=1,
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=summary["outliers"],
+            y=["noise_level"] * len(summary["outliers"]),
+            mode="markers",
+            marker_color=qualitative.Plotly[0],
+            name=f"{summary['n_outliers']} valeurs extrêmes",
+            showlegend=False,
+        ),
+        row=1,
+        col=1,
+    )
+    fig.add_trace(
+        go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=summary["counts"],
+            width=edges[1] - edges[0],
+            marker_color=qualitative.Plotly[0],
+            hovertemplate="%{x:.1f} dB : %{y}<extra></extra>",
+            showlegend=False,
+        ),
+        row=2,
+        col=1,
     )
 
-    fig = fig.update_layout(
-        xaxis_title="Niveau sonore moyen [dB]",
+    fig.update_layout(
+        title=title,
+        bargap=0,
+        template=get_color_theme(color_scheme),
     )
+    fig.update_xaxes(title_text="Niveau sonore moyen [dB]", row=2, col=1)
+    fig.update_yaxes(title_text="count", row=2, col=1)
+    fig.update_yaxes(showticklabels=False, row=1, col=1)
 
     # Ajouter les lignes verticales sans annotation dans add_vline
     fig.add_vline(x=40, line_dash="dash", line_color="#0037A7")
@@ -179,12 +284,96 @@ def histo_noise_sensors(
     return fig
 
 
+def bar_noise_exceedance(
+    df: pd.DataFrame, by: str, color_scheme: str = "dark"
+) -> go.Figure:
+    import plotly.express as px
+
+    over = [column for column in df.columns if column.startswith("over_")]
+    df_long = df.melt(
+        id_vars=[by, "Lden", "Lnight"],
+        value_vars=over,
+        var_name="threshold",
+        value_name="hours",
+    )
+    df_long["threshold"] = df_long["threshold"].str.replace("over_", "≥ ") + " dB"
+
+    fig = px.bar(
+        df_long,
+        x=by,
+        y="hours",
+        color="threshold",
+        barmode="group",
+        log_y=True,
+        hover_data={"Lden": ":.1f", "Lnight": ":.1f"},
+        color_discrete_sequence=NOISE_THRESHOLD_COLORS,
+        title="Heures de dépassement des seuils de bruit par capteur en 2023",
+        template=get_color_theme(color_scheme),
+    )
+    fig.update_layout(
+        xaxis_title=None,
+        yaxis_title="Heures par capteur",
+        legend_title_text="Seuil",
+    )
+    return fig
+
+
+def scatter_noise_events(df: pd.DataFrame, color_scheme: str = "dark") -> go.Figure:
+    import plotly.express as px
+
+    fig = px.scatter(
+        df,
+        x="start",
+        y="peak_level",
+        color="source",
+        size="hours",
+        size_max=20,
+        hover_name="id",
+        hover_data=["district_name", "hours", "peak_zscore"],
+        title="Épisodes de bruit anormal détectés par les capteurs en 2023",
+        template=get_color_theme(color_scheme),
+    )
+    fig.update_layout(
+        xaxis_title=None,
+        yaxis_title="Niveau sonore maximal [dB]",
+        legend_title_text="Type de bruit",
+    )
+    return fig
+
+
+def scatter_noise_weather(
+    df: pd.DataFrame, source: str, variable: str, label: str, color_scheme: str = "dark"
+) -> go.Figure:
+    import plotly.express as px
+
+    df = df[df["source"] == source]
+    df_daily = (
+        df.groupby(df["date"].dt.date)[["noise_level", variable]].mean().astype("float32")
+    )
+
+    fig = px.scatter(
+        df_daily.reset_index(),
+        x=variable,
+        y="noise_level",
+        hover_name="date",
+        title=f"Niveau de bruit moyen journalier en fonction de la météo ({source})",
+        template=get_color_theme(color_scheme),
+    )
+    fig.update_layout(
+        xaxis_title=label,
+        yaxis_title="Niveau sonore moyen [dB]",
+    )
+    return fig
+
+
 # --- Air ---
 
 
 def histo_air_rang(
     gdf: gpd.GeoDataFrame, pollutant: str, x: list[float], color_scheme: str = "dark"
 ) -> go.Figure:
+    import plotly.express as px
+
     if pollutant not in ["NO2", "PM2_5", "PM10"]:
         raise ValueError(f"pollutant {pollutant} not in available pollutants.")
 
@@ -218,64 +407,165 @@ def histo_air_rang(
     return fig
 
 
-def map_air_quality(gdf: gpd.GeoDataFrame, gdf_json: str, polluant: str) -> go.Figure:
-    map = folium.Map(
-        location=list(CENTER_BARCELONA.values()),
-        tiles="CartoDB Positron",
-        zoom_start=12.3,
-        prefer_canvas=True,
+def map_air_quality(gdf: gpd.GeoDataFrame, polluant: str) -> str:
+    polluant_display = polluant.replace("_", ".")
+    return render_map(
+        gdf,
+        polluant,
+        colormap=sequential.Plasma_r,
+        title=f"Carte de Barcelone des niveaux de {polluant_display}",
+        caption=polluant_display,
+        tooltip={polluant: polluant_display},
+        categories=list(gdf[polluant].cat.categories),
+        weight=2,
+        fill_opacity=0.6,
+        zoom=12.3,
     )
 
-    # Define a color map for NO2 levels
-    color_map = dict(zip(gdf[polluant].cat.categories, px.colors.sequential.Plasma_r))
 
-    def style_function(feature):
-        return {
-            "fillColor": color_map.get(feature["properties"][polluant], "gray"),
-            "color": color_map.get(feature["properties"][polluant], "gray"),
-            "weight": 2,
-            "fillOpacity": 0.6,
-        }
+# --- Grid ---
 
-    folium.GeoJson(
-        gdf_json,
-        name="Air Quality",
-        tooltip=folium.GeoJsonTooltip(
-            fields=[polluant], aliases=[polluant.replace("_", ".")]
-        ),
-        style_function=style_function,
-    ).add_to(map)
-
-    # Add legend
-    legend_html = f"""
-    <div style="position: fixed; 
-                top: 10px; left: 50px; 
-                border: 1px solid grey; border-radius: 5px; padding: 1px 3px;
-                background-color:white;
-                z-index:9999; font-size:18px;
-                ">
-        <b>Carte de Barcelone des niveaux de {polluant.replace("_", ".")}</b>
-    </div>
-    <div style="position: fixed; 
-                top: 50px; right: 50px; width: 130px; height: {35 + len(gdf[polluant].cat.categories) * 20}px; 
-                border:2px solid grey; z-index:9999; font-size:14px;
-                background-color:white;
-                padding: 5px 10px;
-                ">
-        <b>{polluant.replace("_", ".")}</b><br>
-        {'<br>'.join(f'<i style="background:{color_map[cat]}">&nbsp;&nbsp;&nbsp;&nbsp;</i> {cat}' for cat in gdf[polluant].cat.categories)}<br>
-    </div>
-    """
 
-    map.get_root().html.add_child(folium.Element(legend_html))
+def map_grid(
+    gdf: gpd.GeoDataFrame,
+    column: str,
+    title: str,
+    colorscale: str = "Viridis",
+    color_scheme: str = "dark",
+) -> go.Figure:
+    # Empty cells are dropped, the figure only carries the cells holding a value
+    gdf_map = gdf[gdf[column].notna()]
+    geometry = gpd.GeoSeries(
+        shapely.set_precision(gdf_map.geometry.values, PRECISION), index=gdf_map.index
+    )
+    fig = go.Figure(
+        go.Choroplethmapbox(
+            geojson=geometry.__geo_interface__,
+            locations=gdf_map.index.astype(str),
+            z=gdf_map[column],
+            colorscale=colorscale,
+            marker_opacity=0.7,
+            marker_line_width=0,
+            colorbar_title=title,
+        )
+    )
+
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        mapbox_zoom=11,
+        mapbox_center=CENTER_BARCELONA,
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        template=get_color_theme(color_scheme),
+        # Keeps the view of the user when the grid is swapped on zoom
+        uirevision="grid",
+    )
+    return fig
+
+
+# --- Trees ---
+
+
+def map_trees_density(
+    gdf: gpd.GeoDataFrame, gdf_json: str | dict, color_scheme: str = "dark"
+) -> go.Figure:
+    fig = go.Figure(
+        go.Choroplethmapbox(
+            geojson=gdf_json,
+            locations=gdf["code"].astype(str),
+            z=gdf["trees_per_km2"].round(),
+            colorscale="YlGn",
+            marker_opacity=0.7,
+            marker_line_width=0.5,
+            colorbar_title="Arbres par km²",
+            text=gdf["name"] + "<br>Arbres : " + gdf["trees"].astype(str),
+        )
+    )
+
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        mapbox_zoom=11,
+        mapbox_center=CENTER_BARCELONA,
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=450,
+        template=get_color_theme(color_scheme),
+    )
+    return fig
+
+
+def _raster_png(density: np.ndarray, colormap: str, vmax: float) -> str:
+    """Data URL of a PNG of the raster, transparent where it is empty."""
+    import base64
+    import io
+
+    from matplotlib import colormaps
+    from matplotlib.image import imsave
+
+    rgba = colormaps[colormap](np.clip(density / vmax, 0, 1))
+    rgba[..., 3] = np.where(density > vmax / 100, 0.7, 0)
+
+    buffer = io.BytesIO()
+    # The rows of the raster go northward, those of the image southward
+    imsave(buffer, np.flipud(rgba), format="png")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def map_trees_surface(raster: dict, color_scheme: str = "dark") -> go.Figure:
+    """
+    Continuous tree density drawn over the basemap as a single image, so its
+    size does not grow with the number of pixels like a trace would.
+    """
+    colorscale = "YlGn"
+    vmax = float(np.quantile(raster["density"], 0.99))
+
+    # Corners of the raster from EPSG:25831 to longitudes and latitudes, in
+    # the order of mapbox image layers
+    x, y = raster["x"], raster["y"]
+    corners = gpd.GeoSeries(
+        gpd.points_from_xy([x[0], x[-1], x[-1], x[0]], [y[-1], y[-1], y[0], y[0]]),
+        crs="EPSG:25831",
+    ).to_crs(epsg=4326)
+
+    fig = go.Figure(
+        # Invisible trace carrying the color bar of the image
+        go.Scattermapbox(
+            lat=[CENTER_BARCELONA["lat"]] * 2,
+            lon=[CENTER_BARCELONA["lon"]] * 2,
+            mode="markers",
+            marker=dict(
+                color=[0, vmax],
+                colorscale=colorscale,
+                showscale=True,
+                colorbar_title="Arbres par km²",
+                opacity=0,
+            ),
+            hoverinfo="skip",
+        )
+    )
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        mapbox_zoom=11,
+        mapbox_center=CENTER_BARCELONA,
+        mapbox_layers=[
+            dict(
+                sourcetype="image",
+                source=_raster_png(raster["density"], colorscale, vmax),
+                coordinates=[[point.x, point.y] for point in corners],
+            )
+        ],
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=450,
+        template=get_color_theme(color_scheme),
+    )
+    return fig
 
-    return map.get_root().render()
 
 # --- Life Quality ---
 
 def corrplot_score(df: pd.DataFrame, color_scheme: str = "dark") -> go.Figure:
+    import plotly.express as px
+
     # Calculate the correlation matrix and round to 2 decimals
-    corr_matrix = df[["score_NO2", "score_PM10", "score_PM2_5", "score_noise", "score_trees", "score_hospitals"]].corr().round(2)
+    corr_matrix = df[["score_NO2", "score_PM10", "score_PM2_5", "score_noise", "score_trees", "score_vegetation", "score_hospitals"]].corr().round(2)
 
     # Create a heatmap using plotly
     fig = px.imshow(corr_matrix, text_auto=True, aspect="auto", title="Matrice de corrélation des scores de qualité de vie")
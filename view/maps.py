@@ -0,0 +1,364 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import jinja2
+
+CENTER_BARCELONA = {"lat": 41.3951, "lon": 2.1734}
+
+ASSETS_PATH = "./assets/html/"
+
+# Coordinates are rounded to about 10 cm, which keeps the files small
+PRECISION = 1e-6
+
+# Sampled colors of the continuous legends
+LEGEND_STEPS = 10
+
+MAP_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no" />
+    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.css"/>
+    <script src="https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist/leaflet.js"></script>
+    <style>
+        html, body {width: 100%; height: 100%; margin: 0; padding: 0;}
+        #map {position: absolute; top: 0; bottom: 0; right: 0; left: 0;}
+        .map-title {position: fixed; top: 10px; left: 50px; z-index: 9999; border: 1px solid grey; border-radius: 5px; padding: 1px 6px; background-color: white; font-size: 18px;}
+        .map-legend {border: 2px solid grey; padding: 5px 10px; background-color: white; font-size: 14px;}
+        .map-legend i {display: inline-block; width: 18px; height: 12px; margin-right: 4px;}
+    </style>
+</head>
+<body>
+    <div id="map"></div>
+    {% if title %}<div class="map-title"><b>{{ title | e }}</b></div>{% endif %}
+    <script>
+        var map = L.map("map", {center: [{{ center.lat }}, {{ center.lon }}], zoom: {{ zoom }}, preferCanvas: true});
+        L.tileLayer("https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png", {
+            attribution: "&copy; OpenStreetMap contributors &copy; CARTO",
+            subdomains: "abcd",
+            maxZoom: 20
+        }).addTo(map);
+
+        var style = {{ style | tojson }};
+        var fields = {{ fields | tojson }};
+        var aliases = {{ aliases | tojson }};
+        L.geoJSON({{ geojson }}, {
+            style: function (feature) {
+                return Object.assign({}, style, {
+                    fillColor: feature.properties.color,
+                    color: style.color || feature.properties.color
+                });
+            },
+            onEachFeature: function (feature, layer) {
+                layer.bindTooltip(fields.map(function (field, i) {
+                    return "<b>" + aliases[i] + "</b> " + feature.properties[field];
+                }).join("<br>"));
+            }
+        }).addTo(map);
+        {% if markers %}
+        L.geoJSON({{ markers }}, {
+            onEachFeature: function (feature, layer) {
+                layer.bindPopup(feature.properties.popup);
+            }
+        }).addTo(map);
+        {% endif %}
+        var legend = L.control({position: "topright"});
+        legend.onAdd = function () {
+            var div = L.DomUtil.create("div", "map-legend");
+            div.innerHTML = {{ legend | tojson }};
+            return div;
+        };
+        legend.addTo(map);
+    </script>
+</body>
+</html>
+"""
+
+# --- RENDERING ---
+
+
+@lru_cache(maxsize=1)
+def _get_template() -> jinja2.Template:
+    return jinja2.Environment(autoescape=False).from_string(MAP_TEMPLATE)
+
+
+def _hex_colors(rgba: np.ndarray) -> np.ndarray:
+    """Hex codes of an array of RGBA floats, in one vectorized pass."""
+    rgb = np.round(rgba[:, :3] * 255).astype(np.uint32)
+    return np.char.mod("#%06x", (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2])
+
+
+def _to_geojson(gdf: gpd.GeoDataFrame) -> str:
+    gdf = gdf.to_crs(epsg=4326)
+    return gdf.set_geometry(
+        shapely.set_precision(gdf.geometry.values, PRECISION)
+    ).to_json(drop_id=True)
+
+
+def _colormap_from_list(colors: list[str]) -> Callable[[np.ndarray], np.ndarray]:
+    from matplotlib.colors import to_rgba_array
+
+    rgba = to_rgba_array(colors)
+    positions = np.linspace(0, 1, len(colors))
+
+    def scale(values: np.ndarray) -> np.ndarray:
+        values = np.clip(np.nan_to_num(values), 0, 1)
+        return np.stack(
+            [np.interp(values, positions, rgba[:, i]) for i in range(4)], axis=-1
+        )
+
+    return scale
+
+
+def render_map(
+    gdf: gpd.GeoDataFrame,
+    column: str,
+    colormap: str | list[str] = "viridis",
+    title: str = None,
+    caption: str = None,
+    tooltip: dict[str, str] = None,
+    categories: list = None,
+    vmin: float = None,
+    vmax: float = None,
+    markers: gpd.GeoDataFrame = None,
+    line_color: str = None,
+    weight: float = 1,
+    fill_opacity: float = 0.7,
+    zoom: float = 12,
+) -> str:
+    """
+    Render a Leaflet map of gdf colored by one column as a standalone HTML page.
+
+    The colors of all the features are computed at once and stored in the
+    GeoJSON, so the page only needs a single style function, and the HTML is
+    produced from a cached template. The same inputs always give the same page.
+
+    Parameters
+    ----------
+    gdf : gpd.GeoDataFrame
+        The features to draw.
+    column : str
+        The column coloring the features.
+    colormap : str | list[str], optional
+        A matplotlib colormap name or a list of colors, by default "viridis".
+    title : str, optional
+        Title displayed on the top left of the map.
+    caption : str, optional
+        Title of the legend, by default the column name.
+    tooltip : dict[str, str], optional
+        Columns shown on hover, mapped to their labels, by default the column.
+    categories : list, optional
+        Ordered categories of a categorical column, by default the column is
+        treated as continuous.
+    vmin, vmax : float, optional
+        Bounds of the continuous color scale, by default those of the column.
+    markers : gpd.GeoDataFrame, optional
+        Points drawn as markers, with their "popup" text.
+    line_color : str, optional
+        Outline color, by default the fill color.
+    weight : float, optional
+        Outline width in pixels.
+    fill_opacity : float, optional
+        Opacity of the fill.
+    zoom : float, optional
+        Initial zoom level.
+
+    Returns
+    -------
+    str
+        The HTML page.
+    """
+    from matplotlib import colormaps
+
+    tooltip = tooltip or {column: column}
+    caption = caption or column
+
+    if categories is not None:
+        palette = (
+            _hex_colors(colormaps[colormap].resampled(len(categories))(range(len(categories))))
+            if isinstance(colormap, str)
+            else np.asarray(colormap[: len(categories)])
+        )
+        codes = pd.Categorical(gdf[column], categories=categories).codes
+        colors = np.where(codes >= 0, palette[codes], "gray")
+        legend = f"<b>{caption}</b><br>" + "<br>".join(
+            f'<i style="background:{color}"></i>{category}'
+            for category, color in zip(categories, palette)
+        )
+    else:
+        values = gdf[column].to_numpy(dtype="float64")
+        vmin = np.nanmin(values) if vmin is None else vmin
+        vmax = np.nanmax(values) if vmax is None else vmax
+        scale = (
+            colormaps[colormap]
+            if isinstance(colormap, str)
+            else _colormap_from_list(colormap)
+        )
+        colors = _hex_colors(scale((values - vmin) / ((vmax - vmin) or 1)))
+        gradient = ", ".join(_hex_colors(scale(np.linspace(0, 1, LEGEND_STEPS))))
+        legend = (
+            f"<b>{caption}</b><br>"
+            f'<div style="width: 200px; height: 12px; background: linear-gradient(to right, {gradient})"></div>'
+            f'<span style="float: left">{vmin:.4g}</span><span style="float: right">{vmax:.4g}</span>'
+        )
+
+    features = gdf[[*tooltip, "geometry"]].assign(color=colors)
+    return _get_template().render(
+        title=title,
+        center=CENTER_BARCELONA,
+        zoom=zoom,
+        style={"color": line_color, "weight": weight, "fillOpacity": fill_opacity},
+        fields=list(tooltip),
+        aliases=list(tooltip.values()),
+        geojson=_to_geojson(features),
+        markers=None if markers is None else _to_geojson(markers[["popup", "geometry"]]),
+        legend=legend,
+    )
+
+
+# --- ASSETS ---
+
+
+def trees_map() -> str:
+    from data.trees import get_tree_rollup
+
+    gdf = get_tree_rollup("district")
+    return render_map(
+        gdf.assign(trees_per_km2=gdf["trees_per_km2"].round(1)),
+        "trees_per_km2",
+        colormap="YlGn",
+        title="Nombre d'arbres par km² dans Barcelone",
+        caption="Arbres par km²",
+        tooltip={"name": "Districts", "trees_per_km2": "Arbres par km²"},
+        line_color="black",
+        weight=0.5,
+        zoom=12.3,
+    )
+
+
+def hospitals_map() -> str:
+    from data.geometry import get_zones
+    from data.grid import mean_nearest_distance
+    from data.load_and_process_data import load_hospital_data
+
+    gdf_hospitals = load_hospital_data()
+    gdf = get_zones("district").join(
+        mean_nearest_distance(gdf_hospitals).round(2), on="code"
+    )
+    return render_map(
+        gdf,
+        "mean_distance",
+        colormap="viridis",
+        title="Distance moyenne d'un habitant à un hôpital pour chaque district",
+        caption="Distance moyenne des hôpitaux les plus proches (m)",
+        tooltip={"name": "District", "mean_distance": "Distance moyenne (m)"},
+        markers=gdf_hospitals.rename(columns={"name": "popup"}),
+        line_color="black",
+        fill_opacity=0.6,
+    )
+
+
+def quality_of_life_map() -> str:
+    from data.geometry import get_zones
+
+    df = pd.read_csv(
+        "./data/quality_of_life/quality_of_life_per_district.csv",
+        usecols=["district_code", "score_quality_of_life"],
+    )
+    gdf = get_zones("district").merge(df, left_on="code", right_on="district_code")
+    return render_map(
+        gdf.assign(score_quality_of_life=gdf["score_quality_of_life"].round(3)),
+        "score_quality_of_life",
+        colormap="YlGnBu",
+        title="Carte de Barcelone des niveau de qualité de vie par district",
+        caption="Score de qualité de vie",
+        tooltip={"name": "District", "score_quality_of_life": "Quality of Life Score"},
+        vmin=0,
+        vmax=1,
+        line_color="black",
+        fill_opacity=0.9,
+    )
+
+
+def socio_economic_clusters_map() -> str:
+    from data.geometry import get_zones
+    from data.socio_economic import get_socio_economic_analysis
+    from view.socio_economic import socio_economic_map
+
+    analysis = get_socio_economic_analysis(2021)
+    clusters = analysis["features"][["Codi_Barri"]].assign(
+        Cluster=analysis["pca_df"]["Cluster"].values
+    )
+    gdf = get_zones("barri").merge(clusters, left_on="code", right_on="Codi_Barri")
+    return socio_economic_map(gdf.rename(columns={"name": "nom_barri"}))
+
+
+def air_quality_map(polluant: str) -> str:
+    from data.load_and_process_data import gdf_air
+    from view.life_quality import map_air_quality
+
+    return map_air_quality(gdf_air, polluant)
+
+
+MAP_ASSETS: dict[str, Callable[[], str]] = {
+    "trees/trees_per_km2": trees_map,
+    "hospitals/barcelona_hospitals_mean_distances": hospitals_map,
+    "quality_of_life/quality_of_life_map": quality_of_life_map,
+    "socio_economic/barri_clusters": socio_economic_clusters_map,
+    "air_quality/air_quality_NO2": lambda: air_quality_map("NO2"),
+    "air_quality/air_quality_PM10": lambda: air_quality_map("PM10"),
+    "air_quality/air_quality_PM2_5": lambda: air_quality_map("PM2_5"),
+}
+
+
+def render_asset(name: str, output: str = ASSETS_PATH) -> str:
+    """Render one of the MAP_ASSETS and write it under the output directory."""
+    if name not in MAP_ASSETS:
+        raise ValueError(f"map {name} not in available maps.")
+
+    path = os.path.join(output, f"{name}.html")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temporary file first so the app never serves a partial map
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(MAP_ASSETS[name]())
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Regenerate the folium-style HTML maps of assets/html/."
+    )
+    parser.add_argument(
+        "names",
+        nargs="*",
+        default=list(MAP_ASSETS),
+        help=f"maps to render, by default all of them: {', '.join(MAP_ASSETS)}",
+    )
+    parser.add_argument(
+        "--output", default=ASSETS_PATH, help="output directory, by default assets/html/"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="number of worker processes"
+    )
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for path in executor.map(
+            render_asset, args.names, [args.output] * len(args.names)
+        ):
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,21 @@
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
-from matplotlib.patches import Circle
-import matplotlib.pyplot as plt
+import plotly.io as pio
+from dash import Patch
 import io
-import base64
-import seaborn as sns
-import folium
 
-plt.switch_backend("Agg")
+from view.maps import render_map
+
+CENTER_BARCELONA = {"lat": 41.3951, "lon": 2.1734}
+
+
+def get_color_theme(color_scheme: str):
+    return (
+        pio.templates["mantine_light"]
+        if color_scheme == "light"
+        else pio.templates["mantine_dark"]
+    )
 
 
 def elbow_graph(inertia) -> go.Figure:
@@ -30,7 +39,14 @@ def elbow_graph(inertia) -> go.Figure:
     return fig
 
 
-def corr_circle(pca, pca_df, df):
+def corr_circle(pca, pca_df, df) -> bytes:
+    # Rendered in the image workers only, keeping matplotlib and seaborn out of the boot
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from matplotlib.patches import Circle
+
+    plt.switch_backend("Agg")
+
     # Create a figure with two subplots
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
 
@@ -72,34 +88,125 @@ def corr_circle(pca, pca_df, df):
     buf = io.BytesIO()  # in-memory files
     plt.savefig(buf, format="png")
     plt.close()
-    data = base64.b64encode(buf.getbuffer()).decode("utf8")  # encode to html elements
-    buf.close()
-
-    return "data:image/png;base64,{}".format(data)
-
-
-def socio_economic_map(map_df) -> folium.Map:
-    # Créer une carte centrée sur Barcelone
-    map = folium.Map(location=[41.3851, 2.1734], zoom_start=12)
-
-    # Define a color map for clusters
-    colors = {0: "red", 1: "blue", 2: "green", 3: "purple"}
-
-    # Add GeoJson layers for each cluster
-    for cluster, color in colors.items():
-        feature_group = folium.FeatureGroup(name=f"Cluster {cluster}")
-        folium.GeoJson(
-            map_df[map_df["Cluster"] == cluster],
-            style_function=lambda x, color=color: {
-                "fillColor": color,
-                "color": color,
-                "weight": 0.5,
-                "fillOpacity": 0.7,
-            },
-            tooltip=folium.GeoJsonTooltip(
-                fields=["nom_barri", "Cluster"], aliases=["Neighborhood", "Cluster"]
+
+    # Served through view.images.image_url rather than embedded in the layout
+    return buf.getvalue()
+
+
+def scatter_pca(
+    df: pd.DataFrame, labels: np.ndarray, color_scheme: str = "dark"
+) -> go.Figure:
+    fig = go.Figure(
+        go.Scatter(
+            x=df["PC1"],
+            y=df["PC2"],
+            mode="markers",
+            marker=dict(
+                size=10, color=labels, colorscale="Turbo", cmin=0, cmax=labels.max()
             ),
-        ).add_to(feature_group)
-        feature_group.add_to(map)
+            text=df["Nom_Barri"],
+            customdata=labels,
+            hovertemplate="%{text}<br>Cluster %{customdata}<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        title="ACP des barris",
+        xaxis_title="Composante principale 1",
+        yaxis_title="Composante principale 2",
+        template=get_color_theme(color_scheme),
+        height=450,
+    )
+    return fig
+
 
-    return map
+def corr_circle_pca(loadings: pd.DataFrame, color_scheme: str = "dark") -> go.Figure:
+    angles = np.linspace(0, 2 * np.pi, 100)
+    fig = go.Figure(
+        go.Scatter(
+            x=np.cos(angles),
+            y=np.sin(angles),
+            mode="lines",
+            line=dict(color="gray", width=1),
+            hoverinfo="skip",
+        )
+    )
+
+    # One arrow per feature, from the origin to its correlations with PC1 and PC2
+    for feature, (pc1, pc2) in loadings.iterrows():
+        fig.add_annotation(
+            x=pc1,
+            y=pc2,
+            ax=0,
+            ay=0,
+            xref="x",
+            yref="y",
+            axref="x",
+            ayref="y",
+            text=feature,
+            showarrow=True,
+            arrowhead=2,
+            arrowcolor="red",
+        )
+
+    fig.update_layout(
+        title="Cercle des corrélations",
+        xaxis=dict(range=[-1.1, 1.1], title="PC1"),
+        yaxis=dict(range=[-1.1, 1.1], title="PC2", scaleanchor="x"),
+        showlegend=False,
+        template=get_color_theme(color_scheme),
+        height=450,
+    )
+    return fig
+
+
+def _delta_text(df: pd.DataFrame, delta: str) -> pd.Series:
+    return df["name"] + "<br>" + df[delta].round(2).astype(str)
+
+
+def map_population_delta(
+    df: pd.DataFrame, gdf_json: str | dict, delta: str, title: str, color_scheme: str = "dark"
+) -> go.Figure:
+    fig = go.Figure(
+        go.Choroplethmapbox(
+            geojson=gdf_json,
+            locations=df["code"].astype(str),
+            z=df[delta],
+            zmid=0,
+            colorscale="RdBu_r",
+            marker_opacity=0.7,
+            marker_line_width=0.5,
+            colorbar_title=title,
+            text=_delta_text(df, delta),
+            hoverinfo="text",
+        )
+    )
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        mapbox_zoom=11,
+        mapbox_center=CENTER_BARCELONA,
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=450,
+        template=get_color_theme(color_scheme),
+    )
+    return fig
+
+
+def patch_population_delta(df: pd.DataFrame, delta: str, title: str) -> Patch:
+    patched_fig = Patch()
+    patched_fig["data"][0]["z"] = df[delta].tolist()
+    patched_fig["data"][0]["text"] = _delta_text(df, delta).tolist()
+    patched_fig["data"][0]["colorbar"]["title"]["text"] = title
+    return patched_fig
+
+
+def socio_economic_map(map_df) -> str:
+    return render_map(
+        map_df,
+        "Cluster",
+        colormap=["red", "blue", "green", "purple"],
+        caption="Cluster",
+        tooltip={"nom_barri": "Neighborhood", "Cluster": "Cluster"},
+        categories=[0, 1, 2, 3],
+        weight=0.5,
+        zoom=12,
+    )
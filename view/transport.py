@@ -1,11 +1,52 @@
-import geopandas as gpd
-import plotly.express as px
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.io as pio
+from plotly.colors import get_colorscale, sequential
+from dash import Patch
 
 CENTER_BARCELONA = {"lat": 41.3951, "lon": 2.1334}
 
+CLUSTER_COLORS = {
+    "0": "#1E3A8A",
+    "1": "#3B82F6",
+    "2": "#60A5FA",
+}
+
+# Per district metric shown on the transport maps
+TRANSPORT_MAPS = {
+    "Age_Percentage": {
+        "title": "Carte: Pourcentage de véhicules de 20 ans ou plus par district",
+        "colorscale": get_colorscale("OrRd"),
+        "colorbar": "Pourcentage (%)",
+        "label": "Pourcentage",
+        "unit": "%",
+    },
+    "Green_Percentage": {
+        "title": "Carte: Pourcentage de véhicules vertes par district",
+        "colorscale": get_colorscale("greens"),
+        "colorbar": "Percentage (%)",
+        "label": "Percentage",
+        "unit": "%",
+    },
+    "Vehicles_Per_100": {
+        "title": "Carte: Nombre de véhicules par 100 habitants par district",
+        "colorscale": get_colorscale("purples"),
+        "colorbar": "Nombre de véhicules (%)",
+        "label": "véhicules",
+        "unit": "%",
+    },
+    "Cluster": {
+        "title": "Carte: K-means clustering des districts en fonction de l'âge des véhicules, du pourcentage de véhicules verts et du nombre de véhicules par 100 habitants",
+        "colorscale": [
+            [i / (len(CLUSTER_COLORS) - 1), color]
+            for i, color in enumerate(CLUSTER_COLORS.values())
+        ],
+        "colorbar": "Clusters",
+        "label": "Cluster",
+        "unit": "",
+    },
+}
+
 
 def get_color_theme(color_scheme: str):
     return (
@@ -18,59 +59,15 @@ def get_color_theme(color_scheme: str):
 # --- Transport ---
 
 
-def map_transport_age(
-    gdf: gpd.GeoDataFrame, gdf_json: str, color_scheme: str = "dark"
-) -> go.Figure:
-    fig = go.Figure(
-        go.Choroplethmapbox(
-            geojson=gdf_json,
-            locations=gdf.index,
-            z=gdf["Percentage"].astype(float),
-            colorscale="OrRd",
-            marker_opacity=0.7,
-            marker_line_width=0.5,
-            colorbar_title="Pourcentage (%)",
-            text=gdf["Nom_Districte"]
-            + "<br>Pourcentage: "
-            + gdf["Percentage"].astype(str)
-            + "%",
-        )
-    )
-
-    fig.update_layout(
-        title_text="Carte: Pourcentage de véhicules de 20 ans ou plus par district",
-        title_x=0,
-        mapbox_zoom=10.5,
-        mapbox_center=CENTER_BARCELONA,
-        margin={"r": 0, "t": 40, "l": 0, "b": 0},
-    )
-
-    if color_scheme != "dark":
-        fig.update_layout(
-            mapbox_style="carto-positron",
-            paper_bgcolor="white",
-            plot_bgcolor="white",
-            font=dict(color="black"),
-        )
-
-    else:
-        fig.update_layout(
-            mapbox_style="carto-darkmatter",
-            paper_bgcolor="#242424",
-            plot_bgcolor="#242424",
-            font=dict(color="white"),
-        )
-
-    return fig
+def pie_transport_age(df: pd.DataFrame, color_scheme: str = "dark") -> go.Figure:
+    import plotly.express as px
 
-
-def pie_transport_age(df: pd.DataFrame, color_scheme: str = "dark") -> px.pie:
     fig = px.pie(
         df,
         names="Antiguitat",
         values="Nombre",
         title="Répartition d'acienneté des véhicules",
-        color_discrete_sequence=px.colors.sequential.Reds,
+        color_discrete_sequence=sequential.Reds,
     )
     fig.update_traces(textinfo="percent+label")
     fig.update_layout(title_x=0)
@@ -92,60 +89,15 @@ def pie_transport_age(df: pd.DataFrame, color_scheme: str = "dark") -> px.pie:
     return fig
 
 
-def map_transport_type(
-    gdf: gpd.GeoDataFrame, gdf_json: str, color_scheme: str = "dark"
-) -> go.Figure:
-    fig = go.Figure(
-        go.Choroplethmapbox(
-            geojson=gdf_json,
-            locations=gdf.index,
-            z=gdf["Percentage"].astype(float),
-            colorscale="greens",
-            marker_opacity=0.7,
-            marker_line_width=0.5,
-            colorbar_title="Percentage (%)",
-            text=gdf["Nom_Districte"]
-            + "<br>Percentage: "
-            + gdf["Percentage"].astype(str)
-            + "%",
-            # reversescale=True,
-        )
-    )
-
-    fig.update_layout(
-        title_text="Carte: Pourcentage de véhicules vertes par district",
-        title_x=0,
-        mapbox_zoom=10.5,
-        mapbox_center=CENTER_BARCELONA,
-        margin={"r": 0, "t": 40, "l": 0, "b": 0},
-    )
-
-    if color_scheme != "dark":
-        fig.update_layout(
-            mapbox_style="carto-positron",
-            paper_bgcolor="white",
-            plot_bgcolor="white",
-            font=dict(color="black"),
-        )
-
-    else:
-        fig.update_layout(
-            mapbox_style="carto-darkmatter",
-            paper_bgcolor="#242424",
-            plot_bgcolor="#242424",
-            font=dict(color="white"),
-        )
-
-    return fig
-
+def pie_transport_type(df: pd.DataFrame, color_scheme: str = "dark") -> go.Figure:
+    import plotly.express as px
 
-def pie_transport_type(df: pd.DataFrame, color_scheme: str = "dark") -> px.pie:
     fig = px.pie(
         df,
         names="Tipus_Propulsio",
         values="Nombre",
         title="Répartition des véhicules par type de combustible",
-        color_discrete_sequence=px.colors.sequential.Greens_r,
+        color_discrete_sequence=sequential.Greens_r,
     )
     fig.update_traces(textinfo="percent+label")
     fig.update_layout(title_x=0)
@@ -167,53 +119,9 @@ def pie_transport_type(df: pd.DataFrame, color_scheme: str = "dark") -> px.pie:
     return fig
 
 
-def map_transport_pop(
-    gdf: gpd.GeoDataFrame, gdf_json: str, color_scheme: str = "dark"
-) -> go.Figure:
-    fig = go.Figure(
-        go.Choroplethmapbox(
-            geojson=gdf_json,
-            locations=gdf.index,
-            z=gdf["Vehicles_Per_100"].astype(float),
-            colorscale="purples",
-            marker_opacity=0.7,
-            marker_line_width=0.5,
-            colorbar_title="Nombre de véhicules (%)",
-            text=gdf["Nom_Districte"]
-            + "<br>véhicules: "
-            + gdf["Vehicles_Per_100"].astype(str)
-            + "%",
-        )
-    )
-
-    fig.update_layout(
-        title_text="Carte: Nombre de véhicules par 100 habitants par district",
-        title_x=0,
-        mapbox_zoom=10.5,
-        mapbox_center=CENTER_BARCELONA,
-        margin={"r": 0, "t": 40, "l": 0, "b": 0},
-    )
+def hist_transport_pop(df: pd.DataFrame, color_scheme: str = "dark") -> go.Figure:
+    import plotly.express as px
 
-    if color_scheme != "dark":
-        fig.update_layout(
-            mapbox_style="carto-positron",
-            paper_bgcolor="white",
-            plot_bgcolor="white",
-            font=dict(color="black"),
-        )
-
-    else:
-        fig.update_layout(
-            mapbox_style="carto-darkmatter",
-            paper_bgcolor="#242424",
-            plot_bgcolor="#242424",
-            font=dict(color="white"),
-        )
-
-    return fig
-
-
-def hist_transport_pop(df: pd.DataFrame, color_scheme: str = "dark") -> px.histogram:
     fig = px.bar(
         df,
         x="Nom_Districte",
@@ -248,37 +156,80 @@ def hist_transport_pop(df: pd.DataFrame, color_scheme: str = "dark") -> px.histo
     return fig
 
 
-def map_transport_kmeans(
-    gdf: gpd.GeoDataFrame, gdf_json: str, color_scheme: str = "dark"
-) -> go.Figure:
-    cluster_colors = {
-        "0": "#1E3A8A",
-        "1": "#3B82F6",
-        "2": "#60A5FA",
-    }
+def map_theme(color_scheme: str = "dark") -> dict:
+    return (
+        dict(
+            mapbox=dict(style="carto-positron"),
+            paper_bgcolor="white",
+            plot_bgcolor="white",
+            font=dict(color="black"),
+        )
+        if color_scheme != "dark"
+        else dict(
+            mapbox=dict(style="carto-darkmatter"),
+            paper_bgcolor="#242424",
+            plot_bgcolor="#242424",
+            font=dict(color="white"),
+        )
+    )
+
 
-    gdf["Cluster"] = gdf["Cluster"].astype(str)
+def _map_text(df: pd.DataFrame, metric: str) -> pd.Series:
+    spec = TRANSPORT_MAPS[metric]
+    return (
+        df["Nom_Districte"]
+        + f"<br>{spec['label']}: "
+        + df[metric].astype(str)
+        + spec["unit"]
+    )
 
-    colorscale = [
-        (i / (len(cluster_colors) - 1), color)
-        for i, color in enumerate(cluster_colors.values())
-    ]
 
+def map_transport(
+    df: pd.DataFrame, gdf_json: str | dict, metric: str, color_scheme: str = "dark"
+) -> go.Figure:
+    """
+    District choropleth of one transport metric.
+
+    The geometry is referenced through `gdf_json`, ideally the URL of the
+    district GeoJSON so the browser downloads and caches the polygons once
+    and the figure only carries the district codes and values.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The district metrics, with "district_code" and "Nom_Districte".
+    gdf_json : str | dict
+        URL of the district GeoJSON, or the GeoJSON itself.
+    metric : str
+        One of the TRANSPORT_MAPS keys.
+    color_scheme : str
+        "light" or "dark".
+
+    Returns
+    -------
+    go.Figure
+    """
+    if metric not in TRANSPORT_MAPS:
+        raise ValueError(f"metric {metric} not in available metrics.")
+
+    spec = TRANSPORT_MAPS[metric]
+    is_cluster = metric == "Cluster"
     fig = go.Figure(
         go.Choroplethmapbox(
             geojson=gdf_json,
-            locations=gdf.index,
-            z=gdf["Cluster"].astype(int),
-            colorscale=colorscale,
+            locations=df["district_code"].astype(str),
+            z=df[metric].astype(float),
+            colorscale=spec["colorscale"],
             marker_opacity=0.7,
             marker_line_width=0.5,
-            showscale=False,
-            colorbar_title="Clusters",
-            text=gdf["Nom_Districte"] + "<br>Cluster: " + gdf["Cluster"],
+            showscale=not is_cluster,
+            colorbar_title=spec["colorbar"],
+            text=_map_text(df, metric),
         )
     )
 
-    for cluster, color in cluster_colors.items():
+    # Legend entries of the clusters, only displayed on the cluster metric
+    for cluster, color in CLUSTER_COLORS.items():
         fig.add_trace(
             go.Scattermapbox(
                 lat=[None],
@@ -290,28 +241,47 @@ def map_transport_kmeans(
         )
 
     fig.update_layout(
-        title_text="Carte: K-means clustering des districts en fonction de l'âge des véhicules, du pourcentage de véhicules verts et du nombre de véhicules par 100 habitants",
+        title_text=spec["title"],
         title_x=0,
         mapbox_zoom=10.5,
         mapbox_center=CENTER_BARCELONA,
         margin={"r": 0, "t": 40, "l": 0, "b": 0},
         legend=dict(title="Clusters"),
+        showlegend=is_cluster,
+        **map_theme(color_scheme),
     )
 
-    if color_scheme != "dark":
-        fig.update_layout(
-            mapbox_style="carto-positron",
-            paper_bgcolor="white",
-            plot_bgcolor="white",
-            font=dict(color="black"),
-        )
+    return fig
 
-    else:
-        fig.update_layout(
-            mapbox_style="carto-darkmatter",
-            paper_bgcolor="#242424",
-            plot_bgcolor="#242424",
-            font=dict(color="white"),
-        )
 
-    return fig
+def patch_transport_metric(df: pd.DataFrame, metric: str) -> Patch:
+    """
+    Switch a figure built by `map_transport` to another metric, sending only
+    the values, hover texts and color settings.
+    """
+    if metric not in TRANSPORT_MAPS:
+        raise ValueError(f"metric {metric} not in available metrics.")
+
+    spec = TRANSPORT_MAPS[metric]
+    is_cluster = metric == "Cluster"
+    patched_fig = Patch()
+    patched_fig["data"][0]["z"] = df[metric].astype(float).tolist()
+    patched_fig["data"][0]["text"] = _map_text(df, metric).tolist()
+    patched_fig["data"][0]["colorscale"] = spec["colorscale"]
+    patched_fig["data"][0]["showscale"] = not is_cluster
+    patched_fig["data"][0]["colorbar"]["title"]["text"] = spec["colorbar"]
+    patched_fig["layout"]["title"]["text"] = spec["title"]
+    patched_fig["layout"]["showlegend"] = is_cluster
+    return patched_fig
+
+
+def patch_map_theme(color_scheme: str = "dark") -> Patch:
+    # A Patch does not expand the underscore names of plotly, nor merge the
+    # nested dicts, so each key is set on its own
+    theme = map_theme(color_scheme)
+    patched_fig = Patch()
+    patched_fig["layout"]["mapbox"]["style"] = theme["mapbox"]["style"]
+    patched_fig["layout"]["paper_bgcolor"] = theme["paper_bgcolor"]
+    patched_fig["layout"]["plot_bgcolor"] = theme["plot_bgcolor"]
+    patched_fig["layout"]["font"]["color"] = theme["font"]["color"]
+    return patched_fig